@@ -2,17 +2,63 @@
 
 from __future__ import annotations
 
+import os
 import shutil
 import tempfile
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 import click
 
 from osm_node.handler import extract_features
-from osm_node.index import RoaringIndex, SortedU64Index
+from osm_node.index import PackedU64Index, RoaringIndex, SortedU64Index
 from osm_node.schema import get_feature_specs
-from osm_node.utils import sort_and_unique_chunks
-from osm_node.writers import RoaringWriter, SortedU64Writer
+from osm_node.utils import DEFAULT_CHUNK_SIZE, IN_MEMORY_SORT_THRESHOLD, ChunkedIdBuffer
+from osm_node.writers import (
+    BaseWriter,
+    PackedU64Writer,
+    RoaringBuilder,
+    RoaringWriter,
+    SortedU64Writer,
+)
+
+
+def _write_feature(
+    feature_name: str, buffer: ChunkedIdBuffer | RoaringBuilder, writers: list[BaseWriter]
+) -> list[str]:
+    """Sort one feature's IDs and write its index file(s).
+
+    Features are independent, so this runs concurrently across features.
+    Progress lines are returned rather than echoed so the output stays in
+    feature order.
+
+    Args:
+        feature_name: Name of the feature
+        buffer: Filled ID buffer for the feature
+        writers: Writers of the requested formats, shared by all features
+            (only ``RoaringWriter`` when the buffer is a ``RoaringBuilder``)
+
+    Returns:
+        Progress lines to report for this feature
+    """
+    if isinstance(buffer, RoaringBuilder):
+        # IDs went straight into a bitmap: nothing to sort
+        bitmap = buffer.to_bitmap()
+        count = len(bitmap)
+        for writer in writers:
+            writer.write_bitmap(feature_name, bitmap)
+    else:
+        # Sort and unique in memory (spilled chunks are merged on disk)
+        sorted_ids = buffer.sorted_ids()
+        count = len(sorted_ids)
+        for writer in writers:
+            writer.write(feature_name, sorted_ids)
+
+    if count == 0:
+        return [f"  {feature_name}: 0 nodes (empty)"]
+    return [f"  {feature_name}: {count:,} unique nodes"] + [
+        f"    -> {feature_name}{writer.extension}" for writer in writers
+    ]
 
 
 @click.group()
@@ -38,9 +84,9 @@ def main():
 @click.option(
     "--format",
     "fmt",
-    type=click.Choice(["u64", "roar", "both"]),
+    type=click.Choice(["u64", "roar", "both", "packed"]),
     default="both",
-    help="Index format to generate (default: both)",
+    help="Index format to generate; packed is delta-encoded u64 (default: both)",
 )
 @click.option(
     "--features",
@@ -56,8 +102,31 @@ def main():
 @click.option(
     "--flush-threshold",
     type=int,
-    default=100_000,
-    help="Number of IDs per feature before flushing to disk (default: 100000)",
+    default=DEFAULT_CHUNK_SIZE,
+    help=(
+        "Number of IDs per feature held in memory before spilling to disk "
+        f"(default: {DEFAULT_CHUNK_SIZE})"
+    ),
+)
+@click.option(
+    "--in-memory-threshold",
+    type=int,
+    default=IN_MEMORY_SORT_THRESHOLD,
+    help=(
+        "Spilled bytes up to which chunks are sorted in memory instead of with "
+        "an external merge, split between the features sorted in parallel "
+        "(default: 4 GiB)"
+    ),
+)
+@click.option(
+    "--jobs",
+    type=click.IntRange(min=1),
+    default=None,
+    help=(
+        "Number of features sorted and written in parallel (default: one per "
+        "CPU). Each job sorts up to in-memory-threshold / jobs bytes in memory, "
+        "and needs about as much again for sorting and deduplication"
+    ),
 )
 def build(
     pbf: Path,
@@ -66,6 +135,8 @@ def build(
     features: str,
     tmp: Path | None,
     flush_threshold: int,
+    in_memory_threshold: int,
+    jobs: int | None,
 ):
     """Build indices from a PBF file.
 
@@ -100,62 +171,52 @@ def build(
         tmp_dir.mkdir(parents=True, exist_ok=True)
         cleanup_tmp = False
 
+    # Features are independent; numpy sorting and file writes release the
+    # GIL, so threads overlap them without copying the buffers. Every job
+    # may hold a whole feature in memory while sorting it, so the in-memory
+    # budget is split between them
+    if jobs is None:
+        jobs = os.cpu_count() or 1
+    jobs = max(1, min(jobs, len(feature_specs)))
+
     try:
         # Extract features from PBF
         click.echo("Scanning PBF file...")
-        handler, chunk_paths = extract_features(
+        handler = extract_features(
             pbf,
             feature_specs,
             tmp_dir,
             flush_threshold,
+            in_memory_threshold // jobs,
+            # A roaring-only build needs no sorted IDs
+            bitmaps=fmt == "roar",
         )
 
         stats = handler.get_statistics()
-        click.echo(f"Processed {stats['nodes_processed']:,} nodes")
+        # Behind the C++ prefilter only candidate nodes reach the handler
+        click.echo(f"Examined {stats['nodes_processed']:,} candidate nodes")
         click.echo(f"Matched {stats['nodes_matched']:,} nodes")
 
         # Sort and write indices
         click.echo("Sorting and writing indices...")
 
-        for feature_name in feature_specs:
-            chunks = chunk_paths.get(feature_name, [])
-            raw_count = stats["feature_counts"].get(feature_name, 0)
-
-            if raw_count == 0:
-                click.echo(f"  {feature_name}: 0 nodes (empty)")
-                # Write empty files
-                if fmt in ("u64", "both"):
-                    (out / f"{feature_name}.u64").write_bytes(b"")
-                if fmt in ("roar", "both"):
-                    from pyroaring import BitMap
-
-                    (out / f"{feature_name}.roar").write_bytes(BitMap().serialize())
-                continue
-
-            # Sort and unique the chunks
-            sorted_path = tmp_dir / f"{feature_name}_sorted.u64"
-            unique_count = sort_and_unique_chunks(chunks, sorted_path, tmp_dir)
-
-            click.echo(f"  {feature_name}: {unique_count:,} unique nodes")
-
-            # Read sorted array
-            import numpy as np
-
-            sorted_ids = np.fromfile(sorted_path, dtype="<u8")
-
-            # Write in requested format(s)
-            if fmt in ("u64", "both"):
-                writer = SortedU64Writer(out)
-                writer.write(feature_name, sorted_ids)
-                click.echo(f"    -> {feature_name}.u64")
-
-            if fmt in ("roar", "both"):
-                writer = RoaringWriter(out)
-                writer.write(feature_name, sorted_ids)
-                click.echo(f"    -> {feature_name}.roar")
-
-            # Clean up sorted temp file
-            sorted_path.unlink(missing_ok=True)
+        # Writers hold no per-feature state, so one per format is shared
+        writers: list[BaseWriter] = []
+        if fmt in ("u64", "both"):
+            writers.append(SortedU64Writer(out))
+        if fmt in ("roar", "both"):
+            writers.append(RoaringWriter(out))
+        if fmt == "packed":
+            writers.append(PackedU64Writer(out))
+
+        with ThreadPoolExecutor(max_workers=jobs) as pool:
+            futures = [
+                pool.submit(_write_feature, feature_name, buffer, writers)
+                for feature_name, buffer in handler.buffers.items()
+            ]
+            for future in futures:
+                for line in future.result():
+                    click.echo(line)
 
         click.echo("Done!")
 
@@ -203,7 +264,18 @@ def inspect(index_dir: Path):
             click.echo(f"  {feature}: {info['count']:,} nodes ({mode})")
         click.echo()
 
-    if not u64_files and not roar_files:
+    # Check for packed u64 files
+    packed_files = list(index_dir.glob("*.pu64"))
+    if packed_files:
+        click.echo("Packed uint64 indices (.pu64):")
+        idx = PackedU64Index.load_dir(index_dir)
+        stats = idx.get_statistics()
+        for feature, info in sorted(stats.items()):
+            size_kb = info["size_bytes"] / 1024
+            click.echo(f"  {feature}: {info['count']:,} nodes ({size_kb:.1f} KB)")
+        click.echo()
+
+    if not u64_files and not roar_files and not packed_files:
         click.echo("No index files found.")
 
 
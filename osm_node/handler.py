@@ -2,34 +2,59 @@
 
 from __future__ import annotations
 
+from concurrent.futures import Executor, ThreadPoolExecutor
 from pathlib import Path
+from typing import Union
 
 import osmium
 
 from osm_node.schema import FeatureSpec
-from osm_node.utils import ChunkedIdBuffer
+from osm_node.utils import DEFAULT_CHUNK_SIZE, IN_MEMORY_SORT_THRESHOLD, ChunkedIdBuffer
+from osm_node.writers.roaring import RoaringBuilder
+
+# Per-feature ID collector filled by the handler
+IdBuffer = Union[ChunkedIdBuffer, RoaringBuilder]
 
 
 class OsmiumTaggingHandler(osmium.SimpleHandler):
     """Osmium handler that extracts node IDs matching feature predicates.
 
     This handler streams through a PBF file, evaluates feature predicates
-    on each node's tags, and writes matching node IDs to chunked temp files
-    for later sorting and indexing.
+    on each node's tags, and collects matching node IDs in per-feature
+    buffers, which spill to chunked temp files only past the flush threshold.
+    When applied via ``extract_features``, nodes are pre-filtered in C++ on
+    the specs' tags or keys, so ``node`` only sees candidate nodes, and
+    ``nodes_processed`` counts those candidates rather than every node in
+    the file.
+
+    Specs declaring ``tag_matches`` are compiled once at construction into a
+    routing table keyed by tag key, so each tag costs one dict lookup (two
+    more for routed keys) no matter how many features are extracted. Only
+    specs without ``tag_matches`` fall back to calling their predicate.
     """
 
     def __init__(
         self,
         feature_specs: dict[str, FeatureSpec],
         tmp_dir: Path,
-        flush_threshold: int = 100_000,
+        flush_threshold: int = DEFAULT_CHUNK_SIZE,
+        in_memory_threshold: int = IN_MEMORY_SORT_THRESHOLD,
+        executor: Executor | None = None,
+        bitmaps: bool = False,
     ):
         """Initialize the handler.
 
         Args:
             feature_specs: Dictionary of feature specifications to extract
             tmp_dir: Directory for temporary chunk files
-            flush_threshold: Number of IDs per feature before flushing to disk
+            flush_threshold: Number of IDs per feature held in memory before
+                flushing to disk
+            in_memory_threshold: Spilled bytes per feature up to which chunks
+                are sorted in memory instead of with an external merge
+            executor: Optional executor sorting flushed chunks in the background
+            bitmaps: If True, collect IDs straight into roaring bitmaps
+                (``RoaringBuilder``) instead of sortable buffers; for
+                roaring-only output
         """
         super().__init__()
         self.feature_specs = feature_specs
@@ -37,12 +62,33 @@ class OsmiumTaggingHandler(osmium.SimpleHandler):
         self.flush_threshold = flush_threshold
 
         # Create a buffer for each feature
-        self.buffers: dict[str, ChunkedIdBuffer] = {
-            name: ChunkedIdBuffer(name, self.tmp_dir, flush_threshold)
-            for name in feature_specs
-        }
-
-        # Statistics
+        self.buffers: dict[str, IdBuffer]
+        if bitmaps:
+            self.buffers = {name: RoaringBuilder(flush_threshold) for name in feature_specs}
+        else:
+            self.buffers = {
+                name: ChunkedIdBuffer(
+                    name, self.tmp_dir, flush_threshold, in_memory_threshold, executor
+                )
+                for name in feature_specs
+            }
+
+        # Tag routing table: key -> {value -> buffers}, where the None value
+        # holds the buffers of specs matching on any value of the key
+        self._routing: dict[str, dict[str | None, list[IdBuffer]]] = {}
+        self._predicate_specs: list[tuple[FeatureSpec, IdBuffer]] = []
+
+        for name, spec in feature_specs.items():
+            buffer = self.buffers[name]
+            if not spec.tag_matches:
+                self._predicate_specs.append((spec, buffer))
+                continue
+            for key, value in spec.tag_matches:
+                by_value = self._routing.setdefault(key, {})
+                by_value.setdefault(value, []).append(buffer)
+
+        # Statistics; nodes_processed counts the nodes reaching node(), which
+        # behind the prefilter are only the candidates
         self.nodes_processed = 0
         self.nodes_matched = 0
 
@@ -58,24 +104,47 @@ class OsmiumTaggingHandler(osmium.SimpleHandler):
         if not n.tags:
             return
 
-        # Convert tags to dict for predicate evaluation
-        tags = dict(n.tags)
-        matched = False
-
-        # Evaluate all predicates
-        for name, spec in self.feature_specs.items():
+        tags = n.tags
+        routing_get = self._routing.get
+        hits: list[IdBuffer] = []
+
+        # Single pass over the tags; keys no spec cares about cost one lookup
+        for key, value in tags:
+            by_value = routing_get(key)
+            if by_value is None:
+                continue
+            buffers = by_value.get(None)
+            if buffers:
+                hits.extend(buffers)
+            buffers = by_value.get(value)
+            if buffers:
+                hits.extend(buffers)
+
+        # Predicates only use .get() and `in`, which the TagList answers directly
+        for spec, buffer in self._predicate_specs:
             if spec.predicate(tags):
-                self.buffers[name].add(n.id)
-                matched = True
+                hits.append(buffer)
+
+        if not hits:
+            return
+
+        # A feature matching on several tags still counts the node once
+        if len(hits) > 1:
+            hits = list(dict.fromkeys(hits))
+
+        node_id = n.id
+        for buffer in hits:
+            buffer.add(node_id)
 
-        if matched:
-            self.nodes_matched += 1
+        self.nodes_matched += 1
 
     def get_statistics(self) -> dict:
         """Get extraction statistics.
 
         Returns:
-            Dictionary with processing statistics
+            Dictionary with processing statistics. ``nodes_processed`` is the
+            number of nodes examined in Python: the candidate nodes that
+            passed the prefilter, not the total number of nodes in the file
         """
         return {
             "nodes_processed": self.nodes_processed,
@@ -86,29 +155,84 @@ class OsmiumTaggingHandler(osmium.SimpleHandler):
         }
 
 
+def _build_prefilter(
+    feature_specs: dict[str, FeatureSpec],
+) -> osmium.filter.TagFilter | osmium.filter.KeyFilter | None:
+    """Build the C++ filter that runs before the Python node callback.
+
+    When every spec is declared as exact (key, value) tag matches, a
+    TagFilter on those pairs lets only nodes that will actually match reach
+    Python. If some match accepts any value of a key, a KeyFilter on the
+    union of the interesting keys is used instead (osmium filters cannot be
+    OR-combined).
+
+    Args:
+        feature_specs: Dictionary of feature specifications
+
+    Returns:
+        A TagFilter or KeyFilter, or None if any spec does not declare its
+        keys (its predicate could match anything)
+    """
+    keys: set[str] = set()
+    pairs: set[tuple[str, str]] = set()
+    exact = True
+    for spec in feature_specs.values():
+        if not spec.interesting_keys:
+            return None
+        keys.update(spec.interesting_keys)
+
+        if not spec.tag_matches:
+            exact = False
+        for key, value in spec.tag_matches:
+            if value is None:
+                exact = False
+            else:
+                pairs.add((key, value))
+
+    if not keys:
+        return None
+
+    if exact:
+        return osmium.filter.TagFilter(*sorted(pairs))
+    return osmium.filter.KeyFilter(*sorted(keys))
+
+
 def extract_features(
     pbf_path: str | Path,
     feature_specs: dict[str, FeatureSpec],
     tmp_dir: Path,
-    flush_threshold: int = 100_000,
-) -> tuple[OsmiumTaggingHandler, dict[str, list[Path]]]:
+    flush_threshold: int = DEFAULT_CHUNK_SIZE,
+    in_memory_threshold: int = IN_MEMORY_SORT_THRESHOLD,
+    bitmaps: bool = False,
+) -> OsmiumTaggingHandler:
     """Extract features from a PBF file.
 
     Args:
         pbf_path: Path to the PBF file
         feature_specs: Dictionary of feature specifications
         tmp_dir: Directory for temporary files
-        flush_threshold: Number of IDs per feature before flushing
+        flush_threshold: Number of IDs per feature held in memory before flushing
+        in_memory_threshold: Spilled bytes per feature up to which chunks are
+            sorted in memory
+        bitmaps: If True, collect IDs straight into roaring bitmaps
 
     Returns:
-        Tuple of (handler with stats, dict mapping feature names to chunk paths)
+        Handler with stats and one filled ID buffer per feature
     """
-    handler = OsmiumTaggingHandler(feature_specs, tmp_dir, flush_threshold)
+    # Skip uninteresting nodes in C++ before they cross into Python
+    prefilter = _build_prefilter(feature_specs)
+    filters = [prefilter] if prefilter is not None else []
+
+    # Flushed chunks are sorted on a worker thread while the scan continues
+    with ThreadPoolExecutor(max_workers=1, thread_name_prefix="osm_node_sort") as executor:
+        handler = OsmiumTaggingHandler(
+            feature_specs, tmp_dir, flush_threshold, in_memory_threshold, executor, bitmaps
+        )
 
-    # Process the PBF file - don't need node locations for just extracting IDs
-    handler.apply_file(str(pbf_path), locations=False)
+        # Process the PBF file - don't need node locations for just extracting IDs
+        handler.apply_file(str(pbf_path), locations=False, filters=filters)
 
-    # Get chunk paths for each feature
-    chunk_paths = {name: buffer.get_chunk_paths() for name, buffer in handler.buffers.items()}
+        for buffer in handler.buffers.values():
+            buffer.finish_flushes()
 
-    return handler, chunk_paths
+    return handler
@@ -1,7 +1,8 @@
 """Index loaders for osm-node."""
 
 from osm_node.index.base import BaseIndex
+from osm_node.index.packed import PackedU64Index
 from osm_node.index.roaring import RoaringIndex
 from osm_node.index.sorted_u64 import SortedU64Index
 
-__all__ = ["BaseIndex", "SortedU64Index", "RoaringIndex"]
+__all__ = ["BaseIndex", "SortedU64Index", "RoaringIndex", "PackedU64Index"]
@@ -2,9 +2,66 @@
 
 from __future__ import annotations
 
+import os
 from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Iterable
+from typing import Callable, Iterable, TypeVar
+
+import numpy as np
+
+T = TypeVar("T")
+
+# Upper bound on threads used to load the files of one index directory
+MAX_LOAD_WORKERS = 8
+
+# Largest node ID a uint64 index can hold
+_MAX_ID = 0xFFFFFFFFFFFFFFFF
+
+
+def as_id_array(node_ids: Iterable[int]) -> np.ndarray:
+    """Convert node IDs to a uint64 array, without copying when possible.
+
+    IDs outside 0 to 2**64 - 1 cannot be in any index, so they are dropped
+    rather than wrapped around, and counts agree with ``contains``.
+
+    Args:
+        node_ids: Array, sequence or iterable of node IDs
+
+    Returns:
+        uint64 NumPy array of the valid IDs
+    """
+    if isinstance(node_ids, np.ndarray):
+        if node_ids.dtype.kind == "i":
+            node_ids = node_ids[node_ids >= 0]
+        return node_ids.astype(np.uint64, copy=False)
+    if not isinstance(node_ids, (list, tuple)):
+        node_ids = list(node_ids)
+    try:
+        return np.asarray(node_ids, dtype=np.uint64)
+    except OverflowError:
+        return np.array([i for i in node_ids if 0 <= i <= _MAX_ID], dtype=np.uint64)
+
+
+def load_features(file_paths: Iterable[Path], loader: Callable[[Path], T]) -> dict[str, T]:
+    """Load index files concurrently, keyed by feature name.
+
+    Each file is opened, mapped or deserialized on its own thread, so the
+    per-file syscalls and copies overlap on storage that serves parallel reads.
+
+    Args:
+        file_paths: Index files to load
+        loader: Function loading one file
+
+    Returns:
+        Dictionary mapping file stems to loaded features, in path order
+    """
+    paths = sorted(file_paths)
+    if len(paths) <= 1:
+        return {path.stem: loader(path) for path in paths}
+
+    with ThreadPoolExecutor(max_workers=min(MAX_LOAD_WORKERS, len(paths))) as pool:
+        return dict(zip([path.stem for path in paths], pool.map(loader, paths)))
 
 
 class BaseIndex(ABC):
@@ -70,15 +127,27 @@ class BaseIndex(ABC):
         """
         ...
 
-    def count_all(self, node_ids: Iterable[int]) -> dict[str, int]:
+    def count_all(self, node_ids: Iterable[int], *, parallel: bool = True) -> dict[str, int]:
         """Count node IDs across all features.
 
+        Features are counted on a thread pool: the per-feature work (NumPy
+        searches, roaring intersections, block decoding) runs mostly with the
+        GIL released, so features are counted concurrently.
+
         Args:
             node_ids: Iterable of node IDs to test
+            parallel: If False, count the features one after another
 
         Returns:
             Dictionary mapping feature names to counts
         """
-        # Convert to list to allow multiple iterations
-        ids_list = list(node_ids)
-        return {feature: self.count(feature, ids_list) for feature in self.features}
+        # Convert once so every feature reuses the same array
+        ids = np.ascontiguousarray(as_id_array(node_ids))
+        features = list(self.features)
+        workers = min(len(features), os.cpu_count() or 1)
+        if not parallel or workers < 2:
+            return {feature: self.count(feature, ids) for feature in features}
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            counts = pool.map(lambda feature: self.count(feature, ids), features)
+            return dict(zip(features, counts))
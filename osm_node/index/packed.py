@@ -0,0 +1,322 @@
+"""Delta-encoded, bit-packed uint64 index loader."""
+
+from __future__ import annotations
+
+import struct
+from pathlib import Path
+from typing import Iterable
+
+import numpy as np
+
+from osm_node.index.base import BaseIndex, as_id_array, load_features
+
+# PKDU64 header: 8-byte magic, u32 block size, u32 block count, u64 ID count
+_HEADER = struct.Struct("<8sIIQ")
+
+# Blocks decoded per batch when counting, bounding the temporary arrays
+_DECODE_BATCH = 1024
+
+_BYTE_INDEX = np.arange(8)
+
+
+class PackedIds:
+    """Read-only view of a memory-mapped .pu64 file.
+
+    The block tables are views into the mapping. Queries locate their block
+    through the table of first IDs and decode only the blocks they touch:
+    each packed gap is gathered as an unaligned little-endian word, shifted
+    and masked, and the gaps are prefix-summed back into IDs.
+    """
+
+    def __init__(self, data: np.ndarray):
+        """Initialize from the raw file bytes.
+
+        Args:
+            data: uint8 array holding the whole file (may be memory-mapped)
+
+        Raises:
+            ValueError: If the data is not a PKDU64 file
+        """
+        self.block_size = 0
+        self.count = 0
+        self.firsts = np.array([], dtype=np.uint64)
+        self.offsets = np.zeros(1, dtype=np.uint64)
+        self.widths = np.array([], dtype=np.uint8)
+        self.payload = np.array([], dtype=np.uint8)
+        self.nbytes = len(data)
+
+        if len(data) == 0:
+            return
+
+        magic, block_size, num_blocks, count = _HEADER.unpack_from(data[: _HEADER.size])
+        if magic[:6] != b"PKDU64":
+            raise ValueError("Not a PKDU64 file")
+
+        self.block_size = block_size
+        self.count = count
+
+        offset = _HEADER.size
+        self.firsts = data[offset : offset + 8 * num_blocks].view("<u8")
+        offset += 8 * num_blocks
+        self.offsets = data[offset : offset + 8 * (num_blocks + 1)].view("<u8")
+        offset += 8 * (num_blocks + 1)
+        self.widths = data[offset : offset + num_blocks]
+        offset += num_blocks
+        self.payload = data[offset:]
+
+    @classmethod
+    def load(cls, path: str | Path) -> "PackedIds":
+        """Memory-map a .pu64 file.
+
+        Args:
+            path: Path to the .pu64 file
+
+        Returns:
+            Packed ID set backed by the file
+        """
+        file_path = Path(path)
+        if file_path.stat().st_size == 0:
+            return cls(np.array([], dtype=np.uint8))
+        return cls(np.memmap(file_path, dtype=np.uint8, mode="r").view(np.ndarray))
+
+    def decode_blocks(self, blocks: np.ndarray) -> np.ndarray:
+        """Decode blocks into their IDs.
+
+        The padding after the last ID of the final block repeats that ID, so
+        every row stays sorted and never holds an ID that is not in the set.
+
+        Args:
+            blocks: Ascending block numbers
+
+        Returns:
+            uint64 array of shape ``(len(blocks), block_size)``
+        """
+        block_size = self.block_size
+        widths = self.widths[blocks].astype(np.uint64)
+        slots = np.arange(block_size, dtype=np.uint64)
+
+        # Bit position of every gap, split into a byte address and a shift
+        bit_pos = slots * widths[:, None]
+        starts = (self.offsets[blocks][:, None] + (bit_pos >> np.uint64(3))).astype(np.intp)
+        shifts = bit_pos & np.uint64(7)
+
+        words = self.payload[starts[..., None] + _BYTE_INDEX].view("<u8")[..., 0]
+        gaps = words >> shifts
+        if widths.max(initial=0) > 56:
+            # Wide gaps can spill into a ninth byte
+            ninth = self.payload[starts + 8].astype(np.uint64)
+            gaps |= np.where(shifts > 0, ninth << ((np.uint64(64) - shifts) & np.uint64(63)), 0)
+
+        masks = (np.uint64(1) << np.minimum(widths, np.uint64(63))) - np.uint64(1)
+        masks[widths >= 64] = np.iinfo(np.uint64).max
+        gaps &= masks[:, None]
+
+        ids = np.cumsum(gaps, axis=1)
+        ids += slots
+        ids += self.firsts[blocks][:, None]
+
+        # Clamp the padding of the final block onto its last ID
+        last_block = len(self.firsts) - 1
+        if len(blocks) and blocks[-1] == last_block:
+            valid = self.count - last_block * block_size
+            ids[-1, valid:] = ids[-1, valid - 1]
+
+        return ids
+
+    def to_array(self) -> np.ndarray:
+        """Decode all IDs.
+
+        Returns:
+            Sorted unique uint64 array
+        """
+        if self.count == 0:
+            return np.array([], dtype=np.uint64)
+        blocks = np.arange(len(self.firsts))
+        return np.concatenate(
+            [
+                self.decode_blocks(blocks[start : start + _DECODE_BATCH]).ravel()
+                for start in range(0, len(blocks), _DECODE_BATCH)
+            ]
+        )[: self.count]
+
+    def __contains__(self, node_id: int) -> bool:
+        """Check if a node ID is in the set, decoding a single block.
+
+        Args:
+            node_id: Node ID to check
+
+        Returns:
+            True if present
+        """
+        if self.count == 0 or node_id < 0 or node_id > 0xFFFFFFFFFFFFFFFF:
+            return False
+
+        key = np.uint64(node_id)
+        block = int(self.firsts.searchsorted(key, side="right")) - 1
+        if block < 0:
+            return False
+
+        ids = self.decode_blocks(np.array([block]))[0]
+        idx = ids.searchsorted(key)
+        return bool(idx < len(ids) and ids[idx] == key)
+
+    def count_members(self, ids: np.ndarray) -> int:
+        """Count how many IDs of a uint64 array are in the set.
+
+        Args:
+            ids: uint64 array of node IDs to test
+
+        Returns:
+            Number of IDs present, counting repeated IDs each time
+        """
+        if self.count == 0 or len(ids) == 0:
+            return 0
+
+        # Sorted queries touch each block once, in order
+        ids = np.sort(ids)
+        blocks = self.firsts.searchsorted(ids, side="right").astype(np.intp) - 1
+        first_query = int(np.searchsorted(blocks, 0))
+        ids = ids[first_query:]
+        blocks = blocks[first_query:]
+        if len(ids) == 0:
+            return 0
+
+        touched = blocks[np.concatenate(([True], blocks[1:] != blocks[:-1]))]
+
+        total = 0
+        for start in range(0, len(touched), _DECODE_BATCH):
+            batch = touched[start : start + _DECODE_BATCH]
+            lo = int(np.searchsorted(blocks, batch[0]))
+            hi = int(np.searchsorted(blocks, batch[-1], side="right"))
+            queries = ids[lo:hi]
+
+            # Rows of sorted blocks in ascending order form one sorted array
+            candidates = self.decode_blocks(batch).ravel()
+            found = np.take(candidates, candidates.searchsorted(queries), mode="clip")
+            total += int(np.count_nonzero(found == queries))
+        return total
+
+    def __len__(self) -> int:
+        """Get number of IDs in the set."""
+        return self.count
+
+
+class PackedU64Index(BaseIndex):
+    """Index loader for delta-encoded, bit-packed uint64 files.
+
+    Files are memory-mapped and several times smaller than plain .u64 files,
+    so far fewer pages are touched per query. Lookups decode only the blocks
+    of 128 IDs that the queries fall into.
+    """
+
+    def __init__(self):
+        """Initialize the index."""
+        super().__init__()
+        self.features: dict[str, PackedIds] = {}
+
+    @property
+    def extension(self) -> str:
+        """File extension for packed u64 files."""
+        return ".pu64"
+
+    @classmethod
+    def load_dir(cls, path: str | Path) -> "PackedU64Index":
+        """Load all .pu64 files from a directory.
+
+        Args:
+            path: Directory containing .pu64 files
+
+        Returns:
+            Loaded index instance
+        """
+        index = cls()
+        dir_path = Path(path)
+
+        index.features = load_features(dir_path.glob("*.pu64"), PackedIds.load)
+
+        return index
+
+    @classmethod
+    def load_file(cls, path: str | Path, feature_name: str | None = None) -> "PackedU64Index":
+        """Load a single .pu64 file.
+
+        Args:
+            path: Path to the .pu64 file
+            feature_name: Name for the feature (defaults to filename stem)
+
+        Returns:
+            Loaded index instance
+        """
+        index = cls()
+        file_path = Path(path)
+
+        if feature_name is None:
+            feature_name = file_path.stem
+
+        index.features[feature_name] = PackedIds.load(file_path)
+
+        return index
+
+    def contains(self, feature: str, node_id: int) -> bool:
+        """Check if a node ID is in the feature set.
+
+        Args:
+            feature: Feature name to check
+            node_id: Node ID to look up
+
+        Returns:
+            True if node_id is in the feature set
+
+        Raises:
+            KeyError: If feature is not loaded
+        """
+        if feature not in self.features:
+            raise KeyError(
+                f"Feature '{feature}' not loaded. Available: {self.available_features()}"
+            )
+
+        return node_id in self.features[feature]
+
+    def count(self, feature: str, node_ids: Iterable[int]) -> int:
+        """Count how many node IDs are in the feature set.
+
+        Args:
+            feature: Feature name to check
+            node_ids: Iterable of node IDs to test
+
+        Returns:
+            Number of node IDs that are in the feature set
+
+        Raises:
+            KeyError: If feature is not loaded
+        """
+        if feature not in self.features:
+            raise KeyError(
+                f"Feature '{feature}' not loaded. Available: {self.available_features()}"
+            )
+
+        return self.features[feature].count_members(as_id_array(node_ids))
+
+    def get_size(self, feature: str) -> int:
+        """Get the number of IDs in a feature set.
+
+        Args:
+            feature: Feature name
+
+        Returns:
+            Number of node IDs in the feature set
+        """
+        if feature not in self.features:
+            raise KeyError(f"Feature '{feature}' not loaded")
+        return len(self.features[feature])
+
+    def get_statistics(self) -> dict:
+        """Get statistics about loaded indices.
+
+        Returns:
+            Dictionary with size info for each feature
+        """
+        return {
+            feature: {"count": len(ids), "size_bytes": ids.nbytes}
+            for feature, ids in self.features.items()
+        }
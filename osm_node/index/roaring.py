@@ -2,33 +2,199 @@
 
 from __future__ import annotations
 
+import array
+import mmap
+import os
+import struct
 from pathlib import Path
 from typing import Iterable
 
-from pyroaring import BitMap
+import numpy as np
+from pyroaring import BitMap, BitMap64, FrozenBitMap, FrozenBitMap64
 
-from osm_node.index.base import BaseIndex
+from osm_node.index.base import BaseIndex, as_id_array, load_features
+
+# Legacy ROAR64 layout: 8-byte magic, u32 group count, then per group a
+# (u32 high, u32 size) header followed by `size` bytes of serialized bitmap
+_ROAR64_COUNT = struct.Struct("<I")
+_ROAR64_GROUP = struct.Struct("<II")
+
+# First u32 of a serialized 32-bit bitmap without run containers, and the low
+# 16 bits of it with run containers (the high 16 bits hold the container
+# count minus one). A 64-bit bitmap starts with its u64 bucket count instead.
+_COOKIE_NO_RUNS = 12346
+_COOKIE_RUNS = 12347
+
+# Containers with more values than this are bitsets rather than arrays
+_MAX_ARRAY_CARDINALITY = 4096
+
+# With run containers, the offset table is only written from this many containers
+_NO_OFFSET_THRESHOLD = 4
+
+
+def _count_members(bitmap: FrozenBitMap | FrozenBitMap64, values: np.ndarray) -> int:
+    """Count how many values are in a bitmap, counting repeated values each time.
+
+    Builds a query bitmap from the sorted values and intersects it with
+    ``bitmap`` in C, then matches the (few) hits back onto the queries with a
+    vectorized binary search instead of one Python-level lookup per value.
+
+    Args:
+        bitmap: 32- or 64-bit bitmap to test against
+        values: Array of values (that fit in 32 bits for a 32-bit bitmap)
+
+    Returns:
+        Number of values present in the bitmap
+    """
+    if len(values) == 0:
+        return 0
+
+    if isinstance(bitmap, FrozenBitMap64):
+        dtype, typecode, query_cls = np.uint64, "Q", BitMap64
+    else:
+        dtype, typecode, query_cls = np.uint32, "I", BitMap
+
+    queries = np.sort(values.astype(dtype, copy=False))
+    # pyroaring's fastest bulk constructors take an array.array
+    query_buf = array.array(typecode)
+    query_buf.frombytes(queries.tobytes())
+
+    found = np.frombuffer(bitmap.intersection(query_cls(query_buf)).to_array(), dtype=dtype)
+    if len(found) == 0:
+        return 0
+
+    indices = np.searchsorted(found, queries)
+    return int(np.count_nonzero(np.take(found, indices, mode="clip") == queries))
+
+
+def _roaring32_size(data: bytes | memoryview) -> int | None:
+    """Get the size of the 32-bit bitmap that data would hold.
+
+    Walks the portable 32-bit layout's headers and containers without
+    deserializing them. A 64-bit bitmap can start with a bucket count that
+    looks like a 32-bit cookie, but its bytes then fail to parse as a 32-bit
+    layout of exactly the same size.
+
+    Args:
+        data: Serialized bitmap data
+
+    Returns:
+        Size in bytes of the 32-bit bitmap, or None if data does not start
+        with a valid 32-bit header
+    """
+    if len(data) < 8:
+        return None
+    (cookie,) = _ROAR64_COUNT.unpack_from(data)
+    if cookie == _COOKIE_NO_RUNS:
+        (num_containers,) = _ROAR64_COUNT.unpack_from(data, 4)
+        offset = 8
+        run_flags = b""
+    elif cookie & 0xFFFF == _COOKIE_RUNS:
+        num_containers = (cookie >> 16) + 1
+        offset = 4 + (num_containers + 7) // 8
+        run_flags = bytes(data[4:offset])
+    else:
+        return None
+    if num_containers > 1 << 16:
+        return None
+
+    headers_end = offset + 4 * num_containers
+    if headers_end > len(data):
+        return None
+    headers = np.frombuffer(data, dtype="<u2", count=2 * num_containers, offset=offset)
+    keys = headers[0::2]
+    if np.any(keys[1:] <= keys[:-1]):
+        return None
+    cardinalities = headers[1::2].astype(np.int64) + 1
+
+    offset = headers_end
+    if not run_flags or num_containers >= _NO_OFFSET_THRESHOLD:
+        offset += 4 * num_containers
+
+    for i, cardinality in enumerate(cardinalities.tolist()):
+        if run_flags and run_flags[i // 8] >> (i % 8) & 1:
+            if offset + 2 > len(data):
+                return None
+            offset += 2 + 4 * int.from_bytes(data[offset : offset + 2], "little")
+        elif cardinality > _MAX_ARRAY_CARDINALITY:
+            offset += 8192
+        else:
+            offset += 2 * cardinality
+    return offset
+
+
+def _roar64_to_bitmap64(data: bytes | memoryview) -> FrozenBitMap64:
+    """Convert a legacy ROAR64 file to a 64-bit bitmap.
+
+    Args:
+        data: Serialized ROAR64 data, magic included
+
+    Returns:
+        Bitmap holding every ID of the file
+    """
+    offset = 8  # Skip magic + padding
+    (num_groups,) = _ROAR64_COUNT.unpack_from(data, offset)
+    offset += _ROAR64_COUNT.size
+
+    groups: list[tuple[int, np.ndarray]] = []
+    with memoryview(data) as view:
+        for _ in range(num_groups):
+            high, size = _ROAR64_GROUP.unpack_from(data, offset)
+            offset += _ROAR64_GROUP.size
+            lows = BitMap.deserialize(view[offset : offset + size]).to_array()
+            groups.append((high, np.frombuffer(lows, dtype=np.uint32)))
+            offset += size
+
+    # Sorted groups give a sorted array, the constructor's fast path
+    groups.sort(key=lambda group: group[0])
+    ids = array.array("Q")
+    for high, lows in groups:
+        ids.frombytes((lows.astype(np.uint64) | np.uint64(high << 32)).tobytes())
+    return FrozenBitMap64(ids)
 
 
 class Roaring64Wrapper:
-    """Wrapper for handling 64-bit node IDs with 32-bit roaring bitmaps.
+    """Wrapper over 32- and 64-bit roaring bitmaps of node IDs.
 
-    For IDs that fit in 32 bits, uses a single BitMap.
-    For larger IDs, uses the ROAR64 format with grouped bitmaps.
+    Files whose IDs fit in 32 bits hold a standard ``BitMap``; larger IDs are
+    stored as a ``BitMap64`` (the portable CRoaring 64-bit format). Files in
+    the legacy ROAR64 layout, 32-bit bitmaps grouped by the high 32 bits, are
+    converted to a ``BitMap64`` on load. Loaded bitmaps are immutable.
     """
 
     def __init__(self):
         """Initialize the wrapper."""
         self.is_64bit = False
-        self.bitmap: BitMap | None = None
-        self.high_groups: dict[int, BitMap] = {}
+        self.bitmap: FrozenBitMap | FrozenBitMap64 | None = None
 
     @classmethod
-    def deserialize(cls, data: bytes) -> "Roaring64Wrapper":
+    def load(cls, path: str | Path) -> "Roaring64Wrapper":
+        """Load a .roar file through a read-only memory map.
+
+        The bitmaps are deserialized straight from the mapped pages, so the
+        file is never copied into an intermediate ``bytes`` object. pyroaring
+        copies the data into its own containers, so the map is closed once
+        deserialization is done.
+
+        Args:
+            path: Path to the .roar file
+
+        Returns:
+            Deserialized wrapper
+        """
+        with open(path, "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return cls.deserialize(b"")
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                with memoryview(mm) as view:
+                    return cls.deserialize(view)
+
+    @classmethod
+    def deserialize(cls, data: bytes | memoryview) -> "Roaring64Wrapper":
         """Deserialize from bytes.
 
         Args:
-            data: Serialized bitmap data
+            data: Serialized bitmap data (any buffer-protocol object)
 
         Returns:
             Deserialized wrapper
@@ -36,28 +202,15 @@ class Roaring64Wrapper:
         wrapper = cls()
 
         if len(data) == 0:
-            wrapper.bitmap = BitMap()
-            return wrapper
-
-        # Check for ROAR64 magic header
-        if data[:6] == b"ROAR64":
+            wrapper.bitmap = FrozenBitMap()
+        elif data[:6] == b"ROAR64":
             wrapper.is_64bit = True
-            offset = 8  # Skip magic + padding
-
-            num_groups = int.from_bytes(data[offset : offset + 4], "little")
-            offset += 4
-
-            for _ in range(num_groups):
-                high = int.from_bytes(data[offset : offset + 4], "little")
-                offset += 4
-                size = int.from_bytes(data[offset : offset + 4], "little")
-                offset += 4
-                bm = BitMap.deserialize(data[offset : offset + size])
-                offset += size
-                wrapper.high_groups[high] = bm
+            wrapper.bitmap = _roar64_to_bitmap64(data)
+        elif _roaring32_size(data) == len(data):
+            wrapper.bitmap = FrozenBitMap.deserialize(data)
         else:
-            # Standard 32-bit bitmap
-            wrapper.bitmap = BitMap.deserialize(data)
+            wrapper.is_64bit = True
+            wrapper.bitmap = FrozenBitMap64.deserialize(data)
 
         return wrapper
 
@@ -70,26 +223,31 @@ class Roaring64Wrapper:
         Returns:
             True if present
         """
-        if self.is_64bit:
-            high = (node_id >> 32) & 0xFFFFFFFF
-            low = node_id & 0xFFFFFFFF
-            if high in self.high_groups:
-                return low in self.high_groups[high]
+        if self.bitmap is None:
             return False
-        else:
-            if self.bitmap is None:
-                return False
-            # For 32-bit, just check directly (truncate if needed)
-            if node_id > 0xFFFFFFFF:
-                return False
-            return node_id in self.bitmap
+        limit = 0xFFFFFFFFFFFFFFFF if self.is_64bit else 0xFFFFFFFF
+        if node_id < 0 or node_id > limit:
+            return False
+        return node_id in self.bitmap
+
+    def count(self, ids: np.ndarray) -> int:
+        """Count how many IDs of a uint64 array are in the bitmap.
+
+        Args:
+            ids: uint64 array of node IDs to test
+
+        Returns:
+            Number of IDs present, counting repeated IDs each time
+        """
+        if self.bitmap is None:
+            return 0
+        if self.is_64bit:
+            return _count_members(self.bitmap, ids)
+        return _count_members(self.bitmap, ids[ids <= 0xFFFFFFFF])
 
     def __len__(self) -> int:
         """Get total number of elements."""
-        if self.is_64bit:
-            return sum(len(bm) for bm in self.high_groups.values())
-        else:
-            return len(self.bitmap) if self.bitmap else 0
+        return len(self.bitmap) if self.bitmap is not None else 0
 
 
 class RoaringIndex(BaseIndex):
@@ -121,10 +279,7 @@ class RoaringIndex(BaseIndex):
         index = cls()
         dir_path = Path(path)
 
-        for file_path in dir_path.glob("*.roar"):
-            feature_name = file_path.stem
-            data = file_path.read_bytes()
-            index.features[feature_name] = Roaring64Wrapper.deserialize(data)
+        index.features = load_features(dir_path.glob("*.roar"), Roaring64Wrapper.load)
 
         return index
 
@@ -145,8 +300,7 @@ class RoaringIndex(BaseIndex):
         if feature_name is None:
             feature_name = file_path.stem
 
-        data = file_path.read_bytes()
-        index.features[feature_name] = Roaring64Wrapper.deserialize(data)
+        index.features[feature_name] = Roaring64Wrapper.load(file_path)
 
         return index
 
@@ -171,6 +325,9 @@ class RoaringIndex(BaseIndex):
     def count(self, feature: str, node_ids: Iterable[int]) -> int:
         """Count how many node IDs are in the feature set.
 
+        The IDs are converted to an array once and tested in bulk rather than
+        one membership check per ID.
+
         Args:
             feature: Feature name to check
             node_ids: Iterable of node IDs to test
@@ -184,8 +341,7 @@ class RoaringIndex(BaseIndex):
         if feature not in self.features:
             raise KeyError(f"Feature '{feature}' not loaded. Available: {self.available_features()}")
 
-        wrapper = self.features[feature]
-        return sum(1 for nid in node_ids if nid in wrapper)
+        return self.features[feature].count(as_id_array(node_ids))
 
     def get_size(self, feature: str) -> int:
         """Get the number of IDs in a feature set.
@@ -7,7 +7,26 @@ from typing import Iterable
 
 import numpy as np
 
-from osm_node.index.base import BaseIndex
+from osm_node.index.base import BaseIndex, as_id_array, load_features
+from osm_node.utils import _U64_DTYPE
+
+
+def _map_u64(file_path: Path) -> np.ndarray:
+    """Memory-map a .u64 file as a plain read-only ndarray.
+
+    The ``np.memmap`` subclass adds Python-level overhead to every indexing
+    operation, so the mapping is exposed through an ``ndarray`` view, which
+    keeps the map alive through its base.
+
+    Args:
+        file_path: Path to the .u64 file
+
+    Returns:
+        uint64 array backed by the file (an empty array for empty files)
+    """
+    if file_path.stat().st_size == 0:
+        return np.array([], dtype=np.uint64)
+    return np.memmap(file_path, dtype=_U64_DTYPE, mode="r").view(np.ndarray)
 
 
 class SortedU64Index(BaseIndex):
@@ -40,19 +59,8 @@ class SortedU64Index(BaseIndex):
         index = cls()
         dir_path = Path(path)
 
-        for file_path in dir_path.glob("*.u64"):
-            feature_name = file_path.stem
-
-            if file_path.stat().st_size == 0:
-                # Empty file - use empty array
-                index.features[feature_name] = np.array([], dtype=np.uint64)
-            else:
-                # Memory-map the file for near-zero RAM usage
-                index.features[feature_name] = np.memmap(
-                    file_path,
-                    dtype="<u8",
-                    mode="r",
-                )
+        # Memory-map the files for near-zero RAM usage
+        index.features = load_features(dir_path.glob("*.u64"), _map_u64)
 
         return index
 
@@ -73,16 +81,19 @@ class SortedU64Index(BaseIndex):
         if feature_name is None:
             feature_name = file_path.stem
 
-        if file_path.stat().st_size == 0:
-            index.features[feature_name] = np.array([], dtype=np.uint64)
-        else:
-            index.features[feature_name] = np.memmap(file_path, dtype="<u8", mode="r")
+        index.features[feature_name] = _map_u64(file_path)
 
         return index
 
     def contains(self, feature: str, node_id: int) -> bool:
         """Check if a node ID is in the feature set using binary search.
 
+        The key is converted to ``np.uint64`` before searching: a Python int
+        key sends ``searchsorted`` down a slow mixed-type path that costs
+        orders of magnitude more than the search itself, and goes through
+        float64, which is inexact above 2**53. Keep the conversion when
+        changing this method.
+
         Args:
             feature: Feature name to check
             node_id: Node ID to look up
@@ -97,17 +108,20 @@ class SortedU64Index(BaseIndex):
             raise KeyError(f"Feature '{feature}' not loaded. Available: {self.available_features()}")
 
         arr = self.features[feature]
-        if len(arr) == 0:
+        size = arr.shape[0]
+        if size == 0 or node_id < 0 or node_id > 0xFFFFFFFFFFFFFFFF:
             return False
 
-        # Binary search
-        idx = np.searchsorted(arr, node_id)
-        return bool(idx < len(arr) and arr[idx] == node_id)
+        # Binary search with a key of the array's own dtype
+        key = np.uint64(node_id)
+        idx = arr.searchsorted(key)
+        return bool(idx < size and arr[idx] == key)
 
     def count(self, feature: str, node_ids: Iterable[int]) -> int:
         """Count how many node IDs are in the feature set.
 
-        Uses vectorized binary search for efficiency.
+        Uses vectorized binary search for efficiency. NumPy arrays are used
+        as-is; other iterables are converted once without a list round trip.
 
         Args:
             feature: Feature name to check
@@ -116,6 +130,24 @@ class SortedU64Index(BaseIndex):
         Returns:
             Number of node IDs that are in the feature set
 
+        Raises:
+            KeyError: If feature is not loaded
+        """
+        return self.count_array(feature, as_id_array(node_ids))
+
+    def count_array(self, feature: str, ids: np.ndarray) -> int:
+        """Count how many IDs of a uint64 array are in the feature set.
+
+        The queries are sorted (on a copy) before searching, which keeps the
+        accesses to large memory-mapped indices sequential.
+
+        Args:
+            feature: Feature name to check
+            ids: uint64 array of node IDs to test
+
+        Returns:
+            Number of node IDs that are in the feature set
+
         Raises:
             KeyError: If feature is not loaded
         """
@@ -123,22 +155,23 @@ class SortedU64Index(BaseIndex):
             raise KeyError(f"Feature '{feature}' not loaded. Available: {self.available_features()}")
 
         arr = self.features[feature]
-        if len(arr) == 0:
+        if len(arr) == 0 or len(ids) == 0:
             return 0
 
-        # Convert to numpy array for vectorized operations
-        ids = np.asarray(list(node_ids), dtype=np.uint64)
-        if len(ids) == 0:
-            return 0
+        # Sorted queries make the probes walk the index monotonically: NumPy's
+        # binary search narrows each search from the previous result, and the
+        # memory-mapped pages are touched in order instead of at random.
+        # The count does not depend on query order, so nothing is un-permuted.
+        ids = np.sort(ids)
 
         # Vectorized binary search
-        indices = np.searchsorted(arr, ids)
+        indices = arr.searchsorted(ids)
 
-        # Check which indices are valid and match
-        valid = indices < len(arr)
-        matches = valid & (arr[np.minimum(indices, len(arr) - 1)] == ids)
+        # Out-of-range indices are clipped onto the last element, which cannot
+        # equal an ID greater than every element
+        matches = np.take(arr, indices, mode="clip") == ids
 
-        return int(np.sum(matches))
+        return int(np.count_nonzero(matches))
 
     def get_size(self, feature: str) -> int:
         """Get the number of IDs in a feature set.
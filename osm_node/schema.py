@@ -3,7 +3,17 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
-from typing import Callable
+from typing import TYPE_CHECKING, Callable, Optional, Tuple, Union
+
+if TYPE_CHECKING:
+    import osmium
+
+# A (key, value) tag condition; a value of None matches any value of the key
+TagMatch = Tuple[str, Optional[str]]
+
+# Tags handed to predicates: the node's osmium TagList during extraction, or
+# a plain dict. Predicates may only use ``tags.get(key)`` and ``key in tags``.
+Tags = Union[dict, "osmium.osm.TagList"]
 
 
 @dataclass(frozen=True)
@@ -12,39 +22,57 @@ class FeatureSpec:
 
     Attributes:
         name: Unique identifier for this feature (used in filenames)
-        predicate: Function that takes a tag dict and returns True if the node matches
+        predicate: Function that takes the node's tags and returns True if the node
+            matches. It receives the osmium TagList itself (no dict copy is made),
+            so it must stick to ``tags.get(key)`` and ``key in tags``
+        interesting_keys: Tag keys the predicate looks at. When every spec declares
+            its keys, extraction pre-filters nodes on these keys in C++ so that
+            irrelevant nodes never reach Python. Leave empty to disable the filter.
+            Derived from tag_matches when not given.
+        tag_matches: Declarative form of the predicate: the node matches if any
+            (key, value) pair is present, with value None meaning any value.
+            Specs that declare it are dispatched through a tag lookup table
+            instead of calling the predicate.
     """
 
     name: str
-    predicate: Callable[[dict], bool]
+    predicate: Callable[[Tags], bool]
+    interesting_keys: tuple[str, ...] = ()
+    tag_matches: tuple[TagMatch, ...] = ()
+
+    def __post_init__(self) -> None:
+        """Derive interesting_keys from tag_matches if not given."""
+        if self.tag_matches and not self.interesting_keys:
+            keys = tuple(dict.fromkeys(key for key, _ in self.tag_matches))
+            object.__setattr__(self, "interesting_keys", keys)
 
 
-def _pred_signal(tags: dict) -> bool:
+def _pred_signal(tags: Tags) -> bool:
     """Match traffic signals (highway=traffic_signals or crossing=traffic_signals)."""
     return tags.get("highway") == "traffic_signals" or tags.get("crossing") == "traffic_signals"
 
 
-def _pred_stop(tags: dict) -> bool:
+def _pred_stop(tags: Tags) -> bool:
     """Match stop signs (highway=stop)."""
     return tags.get("highway") == "stop"
 
 
-def _pred_calming(tags: dict) -> bool:
+def _pred_calming(tags: Tags) -> bool:
     """Match any traffic calming feature (traffic_calming=*)."""
     return "traffic_calming" in tags
 
 
-def _pred_give_way(tags: dict) -> bool:
+def _pred_give_way(tags: Tags) -> bool:
     """Match give way / yield signs (highway=give_way)."""
     return tags.get("highway") == "give_way"
 
 
-def _pred_crossing(tags: dict) -> bool:
+def _pred_crossing(tags: Tags) -> bool:
     """Match pedestrian crossings (highway=crossing)."""
     return tags.get("highway") == "crossing"
 
 
-def _pred_level_crossing(tags: dict) -> bool:
+def _pred_level_crossing(tags: Tags) -> bool:
     """Match railway level crossings (railway=level_crossing)."""
     return tags.get("railway") == "level_crossing"
 
@@ -57,9 +85,13 @@ def default_feature_specs() -> dict[str, FeatureSpec]:
         Default features: signals, stops, calming
     """
     return {
-        "signals": FeatureSpec("signals", _pred_signal),
-        "stops": FeatureSpec("stops", _pred_stop),
-        "calming": FeatureSpec("calming", _pred_calming),
+        "signals": FeatureSpec(
+            "signals",
+            _pred_signal,
+            tag_matches=(("highway", "traffic_signals"), ("crossing", "traffic_signals")),
+        ),
+        "stops": FeatureSpec("stops", _pred_stop, tag_matches=(("highway", "stop"),)),
+        "calming": FeatureSpec("calming", _pred_calming, tag_matches=(("traffic_calming", None),)),
     }
 
 
@@ -73,9 +105,17 @@ def extended_feature_specs() -> dict[str, FeatureSpec]:
     specs = default_feature_specs()
     specs.update(
         {
-            "give_way": FeatureSpec("give_way", _pred_give_way),
-            "crossing": FeatureSpec("crossing", _pred_crossing),
-            "level_crossing": FeatureSpec("level_crossing", _pred_level_crossing),
+            "give_way": FeatureSpec(
+                "give_way", _pred_give_way, tag_matches=(("highway", "give_way"),)
+            ),
+            "crossing": FeatureSpec(
+                "crossing", _pred_crossing, tag_matches=(("highway", "crossing"),)
+            ),
+            "level_crossing": FeatureSpec(
+                "level_crossing",
+                _pred_level_crossing,
+                tag_matches=(("railway", "level_crossing"),),
+            ),
         }
     )
     return specs
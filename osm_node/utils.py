@@ -2,31 +2,66 @@
 
 from __future__ import annotations
 
-import heapq
+import array
+import mmap
 import os
-import struct
-import tempfile
+import sys
+from concurrent.futures import Executor, Future
 from pathlib import Path
-from typing import BinaryIO, Iterator
+from typing import BinaryIO, Callable, Iterator, Sequence
 
 import numpy as np
 
-# Maximum number of IDs to hold in memory before flushing
-DEFAULT_CHUNK_SIZE = 100_000
+# Maximum number of IDs to hold in memory before flushing (8M IDs = 64MB per feature)
+DEFAULT_CHUNK_SIZE = 8_000_000
 
-# Threshold for switching to external sort (10M IDs = 80MB)
-EXTERNAL_SORT_THRESHOLD = 10_000_000
+# Total chunk bytes above which sorting switches to an external merge (4 GiB)
+IN_MEMORY_SORT_THRESHOLD = 4 << 30
 
+# IDs read per input block during a merge (8 MB per input)
+MERGE_BLOCK_SIZE = 1_000_000
 
-def write_ids_to_file(file: BinaryIO, ids: list[int]) -> None:
-    """Write a list of uint64 IDs to a binary file.
+# On-disk ID type: little-endian uint64. On little-endian hosts this is the
+# native uint64, so reads are views and writes need no conversion
+_U64_DTYPE = np.dtype(np.uint64) if sys.byteorder == "little" else np.dtype("<u8")
+
+
+def write_ids_to_file(file: BinaryIO, ids: Sequence[int] | np.ndarray) -> None:
+    """Write uint64 IDs to a binary file.
+
+    Arrays (and ``array('Q')`` buffers) are written straight from their
+    memory; lists are converted once in C rather than packed per argument.
 
     Args:
         file: Open binary file handle
-        ids: List of node IDs to write
+        ids: Node IDs to write
+    """
+    file.write(np.asarray(ids, dtype=_U64_DTYPE))
+
+
+def _map_ids(path: Path) -> np.ndarray:
+    """Memory-map a uint64 ID file as a read-only array.
+
+    The array keeps the mapping alive, so the file is paged in from the page
+    cache on access rather than copied into a heap buffer up front.
+
+    Args:
+        path: Path to the binary file
+
+    Returns:
+        uint64 array backed by the file (an empty array for empty files)
     """
-    data = struct.pack(f"<{len(ids)}Q", *ids)
-    file.write(data)
+    try:
+        f = open(path, "rb", buffering=0)
+    except FileNotFoundError:
+        return np.array([], dtype=np.uint64)
+
+    # One fstat on the open file instead of separate exists/stat calls
+    with f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return np.array([], dtype=np.uint64)
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    return np.frombuffer(mm, dtype=_U64_DTYPE)
 
 
 def read_ids_from_file(path: Path) -> np.ndarray:
@@ -36,32 +71,267 @@ def read_ids_from_file(path: Path) -> np.ndarray:
         path: Path to the binary file
 
     Returns:
-        NumPy array of uint64 IDs
+        Read-only NumPy array of uint64 IDs, memory-mapped from the file
     """
-    if not path.exists() or path.stat().st_size == 0:
-        return np.array([], dtype=np.uint64)
-    return np.fromfile(path, dtype="<u8")
+    return _map_ids(path)
+
+
+def _drop_pages(mm: mmap.mmap, fd: int, offset: int, length: int) -> None:
+    """Release consumed pages of a mapped file from memory.
+
+    The pages are unmapped from the process first, since the kernel keeps
+    mapped pages in the page cache regardless of advice on the file.
+
+    Args:
+        mm: Mapping of the file
+        fd: Open descriptor of the file
+        offset: Page-aligned byte offset of the range
+        length: Length of the range in bytes
+    """
+    if hasattr(mmap, "MADV_DONTNEED"):
+        mm.madvise(mmap.MADV_DONTNEED, offset, length)
+    if hasattr(os, "posix_fadvise"):
+        os.posix_fadvise(fd, offset, length, os.POSIX_FADV_DONTNEED)
 
 
 def iter_ids_from_file(path: Path, chunk_size: int = 1_000_000) -> Iterator[np.ndarray]:
     """Iterate over IDs from a binary file in chunks.
 
+    Pages of a chunk are dropped from memory and from the page cache when the
+    next chunk is requested, so streaming a large file does not evict hotter
+    data. Callers should be done with a chunk before asking for the next one:
+    earlier chunks stay valid, but reading them again reads them from disk.
+
     Args:
         path: Path to the binary file
         chunk_size: Number of IDs per chunk
 
     Yields:
-        NumPy arrays of uint64 IDs
+        Read-only NumPy arrays of uint64 IDs, views into the mapped file
     """
-    if not path.exists():
+    if not path.exists() or path.stat().st_size == 0:
         return
 
     with open(path, "rb") as f:
-        while True:
-            data = f.read(chunk_size * 8)
-            if not data:
-                break
-            yield np.frombuffer(data, dtype="<u8")
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if hasattr(mmap, "MADV_SEQUENTIAL"):
+            mm.madvise(mmap.MADV_SEQUENTIAL)
+        ids = np.frombuffer(mm, dtype=_U64_DTYPE)
+
+        released = 0
+        for start in range(0, len(ids), chunk_size):
+            end = min(start + chunk_size, len(ids))
+            yield ids[start:end]
+
+            # Only whole pages can be released
+            consumed = end * 8 // mmap.PAGESIZE * mmap.PAGESIZE
+            if consumed > released:
+                _drop_pages(mm, f.fileno(), released, consumed - released)
+                released = consumed
+
+
+def uniq_sorted_u64(ids: np.ndarray) -> np.ndarray:
+    """Drop duplicates from already sorted uint64 IDs.
+
+    A single neighbor compare, instead of ``np.unique``'s copy-and-sort.
+
+    Args:
+        ids: Sorted uint64 array
+
+    Returns:
+        Sorted unique IDs (a new array unless there were fewer than two IDs)
+    """
+    if len(ids) < 2:
+        return ids
+
+    keep = np.empty(len(ids), dtype=bool)
+    keep[0] = True
+    np.not_equal(ids[1:], ids[:-1], out=keep[1:])
+    return ids[keep]
+
+
+def sort_unique_u64(ids: np.ndarray) -> np.ndarray:
+    """Sort uint64 IDs in place and drop duplicates.
+
+    Uses NumPy's default sort, which dispatches to the SIMD sorting kernels
+    on recent NumPy, then removes duplicates with ``uniq_sorted_u64``.
+
+    Args:
+        ids: Writable uint64 array; it is sorted in place
+
+    Returns:
+        Sorted unique IDs (a new array unless there were fewer than two IDs)
+    """
+    ids.sort()
+    return uniq_sorted_u64(ids)
+
+
+def _merge_blocks(
+    next_block: Callable[[int], np.ndarray | None], num_inputs: int, out: BinaryIO
+) -> int:
+    """K-way merge sorted inputs delivered in blocks, removing duplicates.
+
+    Every round, the smallest last ID among the inputs' current blocks bounds
+    what is safe to emit: each block's prefix up to it is cut off with one
+    binary search, and the prefixes are merged with a single run-aware sort.
+    The block ending at the bound is used up, so each round costs O(K) Python
+    steps for at least a block of output. Used-up inputs are only advanced
+    once the round is written, as fetching a block may release the previous
+    one (see ``iter_ids_from_file``).
+
+    Args:
+        next_block: Returns the next non-empty block of input ``i``, or None
+            once it is exhausted
+        num_inputs: Number of inputs
+        out: Open binary file the merged IDs are appended to
+
+    Returns:
+        Number of unique IDs written
+    """
+    count = 0
+    last_id: int | None = None
+
+    blocks = [next_block(i) for i in range(num_inputs)]
+    active = [i for i, block in enumerate(blocks) if block is not None]
+
+    while active:
+        bound = min(blocks[i][-1] for i in active)
+
+        runs = []
+        used_up = []
+        for i in active:
+            block = blocks[i]
+            end = int(block.searchsorted(bound, side="right"))
+            runs.append(block[:end])
+            if end == len(block):
+                used_up.append(i)
+            else:
+                blocks[i] = block[end:]
+
+        runs = [run for run in runs if len(run)]
+        if len(runs) == 1:
+            # Only one input reaches the bound: its prefix is already merged
+            merged = runs[0]
+        else:
+            merged = np.concatenate(runs)
+            # Timsort merges the presorted runs instead of sorting from scratch
+            merged.sort(kind="stable")
+        ids = uniq_sorted_u64(merged)
+
+        # Rounds are deduplicated separately; stitch the boundary
+        if last_id is not None and ids[0] == last_id:
+            ids = ids[1:]
+        if len(ids):
+            ids.astype(_U64_DTYPE, copy=False).tofile(out)
+            last_id = int(ids[-1])
+            count += len(ids)
+
+        for i in used_up:
+            blocks[i] = next_block(i)
+        active = [i for i in active if blocks[i] is not None]
+
+    return count
+
+
+def _iter_blocks(ids: np.ndarray, block_size: int) -> Iterator[np.ndarray]:
+    """Iterate over an array in blocks of views.
+
+    Args:
+        ids: Array to split
+        block_size: Number of IDs per block
+
+    Yields:
+        Consecutive non-empty slices of ``ids``
+    """
+    for start in range(0, len(ids), block_size):
+        yield ids[start : start + block_size]
+
+
+def _disjoint_order(runs: Sequence[Sequence[int]]) -> list[int] | None:
+    """Find an order in which sorted runs simply follow one another.
+
+    OSM files are sorted by node ID, so chunks spilled while reading one
+    usually cover disjoint ID ranges. Runs may share a boundary ID, which the
+    deduplication stitches away.
+
+    Args:
+        runs: Non-empty sorted uint64 arrays, or just their (first, last) IDs
+
+    Returns:
+        Indices of the runs in ascending order, or None if any two overlap
+    """
+    order = sorted(range(len(runs)), key=lambda i: int(runs[i][0]))
+    for prev, cur in zip(order, order[1:]):
+        if runs[prev][-1] > runs[cur][0]:
+            return None
+    return order
+
+
+def _write_unique_blocks(blocks: Iterator[np.ndarray], out: BinaryIO) -> int:
+    """Write sorted blocks that follow one another, removing duplicates.
+
+    A single-input block merge: each block is only deduplicated and stitched
+    to the previous one, as there is nothing to interleave.
+
+    Args:
+        blocks: Non-empty sorted uint64 blocks, each starting at or after the
+            end of the previous one
+        out: Open binary file the IDs are appended to
+
+    Returns:
+        Number of unique IDs written
+    """
+    return _merge_blocks(lambda _: next(blocks, None), 1, out)
+
+
+def _file_bounds(path: Path) -> tuple[int, int] | None:
+    """Read the first and last ID of a sorted ID file.
+
+    Args:
+        path: Path to the binary file
+
+    Returns:
+        ``(first, last)`` IDs, or None for an empty or missing file
+    """
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except FileNotFoundError:
+        return None
+    try:
+        size = os.fstat(fd).st_size
+        if size < 8:
+            return None
+        first = int.from_bytes(os.pread(fd, 8, 0), "little")
+        last = int.from_bytes(os.pread(fd, 8, size - 8), "little")
+        return first, last
+    finally:
+        os.close(fd)
+
+
+def merge_sorted_runs(runs: list[np.ndarray], output_path: Path) -> int:
+    """Merge sorted uint64 arrays into one file, removing duplicates.
+
+    The runs are typically slices of a memory-mapped file, so they are paged
+    in block by block as the merge advances.
+
+    Args:
+        runs: Sorted uint64 arrays
+        output_path: Path for the merged output file
+
+    Returns:
+        Number of unique IDs written
+    """
+    runs = [run for run in runs if len(run)]
+    order = _disjoint_order(runs)
+    if order is not None:
+        # No interleaving: stream the runs in order instead of merging
+        blocks = (block for i in order for block in _iter_blocks(runs[i], MERGE_BLOCK_SIZE))
+        with open(output_path, "wb") as out:
+            return _write_unique_blocks(blocks, out)
+
+    readers = [_iter_blocks(run, MERGE_BLOCK_SIZE) for run in runs]
+    with open(output_path, "wb") as out:
+        return _merge_blocks(lambda i: next(readers[i], None), len(readers), out)
 
 
 def merge_sorted_files(
@@ -84,62 +354,34 @@ def merge_sorted_files(
         output_path.write_bytes(b"")
         return 0
 
-    # For single small file, just read, unique, write
+    # For a single file, just read, drop adjacent duplicates, write
     if len(input_paths) == 1:
         ids = read_ids_from_file(input_paths[0])
-        unique_ids = np.unique(ids)
-        unique_ids.tofile(output_path)
+        unique_ids = uniq_sorted_u64(ids)
+        unique_ids.astype(_U64_DTYPE, copy=False).tofile(output_path)
         if remove_inputs:
             input_paths[0].unlink()
         return len(unique_ids)
 
-    # K-way merge with heap
-    count = 0
-    last_id = None
-
-    def file_iterator(path: Path) -> Iterator[int]:
-        """Yield IDs from a file one at a time."""
-        for chunk in iter_ids_from_file(path):
-            yield from chunk
-
-    # Initialize heap with (value, iterator_index, iterator)
-    iterators = [file_iterator(p) for p in input_paths]
-    heap: list[tuple[int, int, Iterator[int]]] = []
-
-    for i, it in enumerate(iterators):
-        try:
-            val = next(it)
-            heapq.heappush(heap, (val, i, it))
-        except StopIteration:
-            pass
-
+    # Blocks are views of sequentially mapped inputs, paged in as the merge
+    # reaches them. Both paths below go through _merge_blocks, which asks for
+    # an input's next block only once the current one is written, so each
+    # block's pages are dropped from the page cache after their last use
+    bounds = [_file_bounds(p) for p in input_paths]
+    inputs = [p for p, b in zip(input_paths, bounds) if b is not None]
+    order = _disjoint_order([b for b in bounds if b is not None])
     with open(output_path, "wb") as out:
-        buffer: list[int] = []
-
-        while heap:
-            val, idx, it = heapq.heappop(heap)
-
-            # Skip duplicates
-            if last_id is None or val != last_id:
-                buffer.append(val)
-                last_id = val
-                count += 1
-
-                # Flush buffer periodically
-                if len(buffer) >= 100_000:
-                    write_ids_to_file(out, buffer)
-                    buffer.clear()
-
-            # Get next value from the same iterator
-            try:
-                next_val = next(it)
-                heapq.heappush(heap, (next_val, idx, it))
-            except StopIteration:
-                pass
-
-        # Write remaining buffer
-        if buffer:
-            write_ids_to_file(out, buffer)
+        if order is not None:
+            # No interleaving: stream the inputs in order instead of merging
+            blocks = (
+                block
+                for i in order
+                for block in iter_ids_from_file(inputs[i], MERGE_BLOCK_SIZE)
+            )
+            count = _write_unique_blocks(blocks, out)
+        else:
+            readers = [iter_ids_from_file(p, MERGE_BLOCK_SIZE) for p in inputs]
+            count = _merge_blocks(lambda i: next(readers[i], None), len(readers), out)
 
     # Clean up input files
     if remove_inputs:
@@ -149,70 +391,41 @@ def merge_sorted_files(
     return count
 
 
-def sort_and_unique_chunks(
-    chunk_paths: list[Path],
-    output_path: Path,
-    tmp_dir: Path | None = None,
-    remove_chunks: bool = True,
-) -> int:
-    """Sort and deduplicate IDs from multiple unsorted chunk files.
-
-    For small total sizes, loads all into memory. For large sizes,
-    sorts each chunk individually then performs k-way merge.
+def write_sorted_chunk(ids: array.array, fd: int, offset: int) -> int:
+    """Sort and deduplicate a buffer of IDs and write it into the parts file.
 
     Args:
-        chunk_paths: List of paths to unsorted chunk files
-        output_path: Path for the final sorted output
-        tmp_dir: Directory for intermediate sorted chunks
-        remove_chunks: If True, delete input chunks after processing
+        ids: Buffer of uint64 IDs, owned by the caller no longer
+        fd: Open file descriptor of the parts file
+        offset: Byte offset of the chunk in the file
 
     Returns:
-        Number of unique IDs written
+        Number of unique IDs written at ``offset``
     """
-    if not chunk_paths:
-        output_path.write_bytes(b"")
-        return 0
-
-    # Calculate total size
-    total_ids = sum(p.stat().st_size // 8 for p in chunk_paths if p.exists())
-
-    if total_ids <= EXTERNAL_SORT_THRESHOLD:
-        # Small enough to fit in memory
-        all_ids = np.concatenate([read_ids_from_file(p) for p in chunk_paths])
-        unique_ids = np.unique(all_ids)
-        unique_ids.tofile(output_path)
-
-        if remove_chunks:
-            for p in chunk_paths:
-                p.unlink(missing_ok=True)
-
-        return len(unique_ids)
-
-    # External sort: sort each chunk, then merge
-    if tmp_dir is None:
-        tmp_dir = Path(tempfile.gettempdir())
-
-    sorted_chunk_paths: list[Path] = []
-
-    for i, chunk_path in enumerate(chunk_paths):
-        ids = read_ids_from_file(chunk_path)
-        ids.sort()
-        sorted_path = tmp_dir / f"sorted_{i:04d}.u64"
-        ids.tofile(sorted_path)
-        sorted_chunk_paths.append(sorted_path)
-
-        if remove_chunks:
-            chunk_path.unlink(missing_ok=True)
-
-    # Merge sorted chunks
-    return merge_sorted_files(sorted_chunk_paths, output_path, remove_inputs=True)
+    unique_ids = sort_unique_u64(np.frombuffer(ids, dtype=np.uint64))
+    data = memoryview(unique_ids.astype(_U64_DTYPE, copy=False)).cast("B")
+    # Positioned writes, so chunks written out of order land in their place
+    while data:
+        written = os.pwrite(fd, data, offset)
+        data = data[written:]
+        offset += written
+    return len(unique_ids)
 
 
 class ChunkedIdBuffer:
-    """Buffer for accumulating node IDs and flushing to temp files.
-
-    Accumulates IDs in memory up to a threshold, then flushes to
-    numbered chunk files on disk.
+    """Buffer for accumulating node IDs and flushing to a temp file.
+
+    Accumulates IDs in an unboxed ``array('Q')`` up to a threshold, then
+    flushes them as a chunk appended to a single per-feature parts file,
+    recording the chunk's span. The threshold acts as a RAM cap: when it is
+    never reached, the IDs are sorted in memory at the end and no temp file
+    is written at all.
+
+    Chunks are sorted and deduplicated as they are flushed, so an external
+    sort only has to merge them. Each chunk keeps the space reserved for its
+    full buffer; its span records how many unique IDs it actually holds.
+    Given an executor, the sort and write run in the background while IDs
+    keep arriving.
     """
 
     def __init__(
@@ -220,20 +433,34 @@ class ChunkedIdBuffer:
         feature_name: str,
         tmp_dir: Path,
         flush_threshold: int = DEFAULT_CHUNK_SIZE,
+        in_memory_threshold: int = IN_MEMORY_SORT_THRESHOLD,
+        executor: Executor | None = None,
     ):
         """Initialize the buffer.
 
         Args:
             feature_name: Name of the feature (used in filenames)
-            tmp_dir: Directory for temp chunk files
+            tmp_dir: Directory for the temp parts file
             flush_threshold: Number of IDs before auto-flush
+            in_memory_threshold: Total spilled bytes up to which the chunks are
+                sorted in memory rather than with an external merge
+            executor: Optional executor that sorts and writes flushed chunks
+                in the background
         """
         self.feature_name = feature_name
         self.tmp_dir = Path(tmp_dir)
         self.flush_threshold = flush_threshold
-        self.buffer: list[int] = []
-        self.chunk_count = 0
-        self.total_count = 0
+        self.in_memory_threshold = in_memory_threshold
+        self.executor = executor
+        self.buffer = array.array("Q")
+        self.parts_path = self.tmp_dir / f"{feature_name}.parts.u64"
+        # (first ID index, unique ID count) of every flushed chunk in the
+        # parts file; the count is only known once the chunk is written
+        self.spans: list[tuple[int, int]] = []
+        self._fd: int | None = None
+        self._flushed_count = 0
+        # (span index, background write) of chunks still being written
+        self._pending: list[tuple[int, Future]] = []
 
         # Ensure tmp dir exists
         self.tmp_dir.mkdir(parents=True, exist_ok=True)
@@ -244,35 +471,128 @@ class ChunkedIdBuffer:
         Args:
             node_id: The node ID to add
         """
-        self.buffer.append(node_id)
-        self.total_count += 1
-
-        if len(self.buffer) >= self.flush_threshold:
+        # array.append stores the unboxed uint64 in C; it is cheaper per call
+        # than item assignment into a preallocated NumPy array
+        buffer = self.buffer
+        buffer.append(node_id)
+        if len(buffer) >= self.flush_threshold:
             self.flush()
 
+    def add_many(self, node_ids: Sequence[int] | np.ndarray) -> None:
+        """Add a batch of node IDs to the buffer.
+
+        The IDs are copied into the buffer as raw bytes, up to the flush
+        threshold at a time, so there is no per-ID Python call.
+
+        Args:
+            node_ids: The node IDs to add
+        """
+        ids = np.ascontiguousarray(node_ids, dtype=np.uint64)
+        start = 0
+        while start < len(ids):
+            stop = min(start + max(self.flush_threshold - len(self.buffer), 1), len(ids))
+            self.buffer.frombytes(memoryview(ids[start:stop]).cast("B"))
+            start = stop
+            if len(self.buffer) >= self.flush_threshold:
+                self.flush()
+
+    @property
+    def total_count(self) -> int:
+        """Number of IDs added so far, including duplicates."""
+        return self._flushed_count + len(self.buffer)
+
+    @property
+    def total_bytes(self) -> int:
+        """Size of the IDs added so far as raw uint64 data."""
+        return self.total_count * 8
+
+    @property
+    def chunk_count(self) -> int:
+        """Number of chunks flushed to the parts file."""
+        return len(self.spans)
+
     def flush(self) -> None:
-        """Flush current buffer to a temp chunk file."""
+        """Flush current buffer as a chunk of the parts file."""
         if not self.buffer:
             return
 
-        chunk_path = self.tmp_dir / f"{self.feature_name}.part{self.chunk_count:04d}.u64"
-        with open(chunk_path, "wb") as f:
-            write_ids_to_file(f, self.buffer)
+        if self._fd is None:
+            self._fd = os.open(self.parts_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+
+        ids = self.buffer
+        start = self._flushed_count
 
-        self.buffer.clear()
-        self.chunk_count += 1
+        self.spans.append((start, len(ids)))
+        self._flushed_count += len(ids)
+        self.buffer = array.array("Q")
 
-    def get_chunk_paths(self) -> list[Path]:
-        """Get list of all chunk file paths.
+        if self.executor is None:
+            self.spans[-1] = (start, write_sorted_chunk(ids, self._fd, start * 8))
+        else:
+            future = self.executor.submit(write_sorted_chunk, ids, self._fd, start * 8)
+            self._pending.append((len(self.spans) - 1, future))
+
+    def finish_flushes(self) -> None:
+        """Wait for background chunk writes and stop using the executor.
+
+        Errors from a background write are re-raised here.
+        """
+        pending, self._pending = self._pending, []
+        self.executor = None
+        for index, future in pending:
+            self.spans[index] = (self.spans[index][0], future.result())
+
+    def get_chunk_spans(self) -> list[tuple[Path, int, int]]:
+        """Get the location of every flushed chunk.
 
         Returns:
-            List of paths to chunk files (flushes buffer first)
+            ``(parts file path, first ID index, ID count)`` per chunk (flushes
+            buffer first)
         """
         self.flush()
-        return [
-            self.tmp_dir / f"{self.feature_name}.part{i:04d}.u64"
-            for i in range(self.chunk_count)
-        ]
+        self.finish_flushes()
+        return [(self.parts_path, start, count) for start, count in self.spans]
+
+    def _discard_parts(self) -> None:
+        """Close and delete the parts file once its chunks are consumed."""
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+        self.parts_path.unlink(missing_ok=True)
+        self.spans = []
+
+    def sorted_ids(self) -> np.ndarray:
+        """Get all IDs added so far, sorted and deduplicated.
+
+        If nothing was spilled to disk, sorts the in-memory buffer without
+        touching the filesystem. Spilled chunks are loaded and sorted in memory
+        when they fit under the in-memory threshold, and only otherwise go
+        through an external merge. The buffer is consumed either way.
+
+        Returns:
+            Sorted unique uint64 array of node IDs
+        """
+        if self.chunk_count == 0:
+            ids = np.frombuffer(self.buffer, dtype=np.uint64)
+            self._flushed_count += len(self.buffer)
+            self.buffer = array.array("Q")
+            return sort_unique_u64(ids)
+
+        self.get_chunk_spans()
+        if self._flushed_count * 8 <= self.in_memory_threshold:
+            # Concatenated, the chunks are sorted runs
+            parts = read_ids_from_file(self.parts_path)
+            ids = np.concatenate([parts[start : start + size] for start, size in self.spans])
+            del parts
+            self._discard_parts()
+            ids.sort(kind="stable")
+            return uniq_sorted_u64(ids)
+
+        sorted_path = self.tmp_dir / f"{self.feature_name}_sorted.u64"
+        self.finalize(sorted_path)
+        ids = read_ids_from_file(sorted_path)
+        sorted_path.unlink(missing_ok=True)
+        return ids
 
     def finalize(self, output_path: Path) -> int:
         """Finalize the buffer, sort/merge all chunks to output.
@@ -283,10 +603,16 @@ class ChunkedIdBuffer:
         Returns:
             Number of unique IDs written
         """
-        chunk_paths = self.get_chunk_paths()
-        return sort_and_unique_chunks(
-            chunk_paths,
-            output_path,
-            tmp_dir=self.tmp_dir,
-            remove_chunks=True,
+        if self.chunk_count == 0 or self.total_bytes <= self.in_memory_threshold:
+            ids = self.sorted_ids()
+            ids.astype(_U64_DTYPE, copy=False).tofile(output_path)
+            return len(ids)
+
+        self.get_chunk_spans()
+        parts = read_ids_from_file(self.parts_path)
+        count = merge_sorted_runs(
+            [parts[start : start + size] for start, size in self.spans], output_path
         )
+        del parts
+        self._discard_parts()
+        return count
@@ -1,7 +1,8 @@
 """Index writers for osm-node."""
 
 from osm_node.writers.base import BaseWriter
-from osm_node.writers.roaring import RoaringWriter
+from osm_node.writers.packed import PackedU64Writer
+from osm_node.writers.roaring import RoaringBuilder, RoaringWriter
 from osm_node.writers.u64 import SortedU64Writer
 
-__all__ = ["BaseWriter", "SortedU64Writer", "RoaringWriter"]
+__all__ = ["BaseWriter", "SortedU64Writer", "RoaringWriter", "RoaringBuilder", "PackedU64Writer"]
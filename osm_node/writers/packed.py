@@ -0,0 +1,115 @@
+"""Delta-encoded, bit-packed uint64 index writer."""
+
+from __future__ import annotations
+
+import struct
+from pathlib import Path
+
+import numpy as np
+
+from osm_node.writers.base import BaseWriter
+
+# Number of IDs per block; a multiple of 8 so every packed block is whole bytes
+BLOCK_SIZE = 128
+
+# Blocks packed per batch, bounding the temporary bit matrix
+_PACK_BATCH = 512
+
+# PKDU64 header: 8-byte magic, u32 block size, u32 block count, u64 ID count
+_HEADER = struct.Struct("<8sIIQ")
+
+# Zero bytes after the payload, so readers can always load 9 bytes per value
+_PADDING = 16
+
+
+def _bit_widths(values: np.ndarray) -> np.ndarray:
+    """Get the number of bits needed for each uint64 value.
+
+    Args:
+        values: uint64 array
+
+    Returns:
+        uint8 array of bit lengths (0 for zero)
+    """
+    values = values.copy()
+    widths = np.zeros(len(values), dtype=np.uint8)
+    for shift in (32, 16, 8, 4, 2, 1):
+        wide = values >= np.uint64(1 << shift)
+        values[wide] >>= np.uint64(shift)
+        widths[wide] += shift
+    widths[values > 0] += 1
+    return widths
+
+
+class PackedU64Writer(BaseWriter):
+    """Writer for delta-encoded, bit-packed uint64 index files.
+
+    IDs are split into blocks of ``BLOCK_SIZE``. Each block stores its first
+    ID in a table and the gaps between consecutive IDs (minus one) packed at
+    the smallest bit width that fits the block's largest gap. Dense runs of
+    OSM node IDs pack to a few bits per ID, or none at all.
+
+    Layout (little-endian):
+        - header: magic ``PKDU64``, block size, block count, ID count
+        - first ID of every block (u64 each)
+        - byte offset of every block in the payload, plus the end (u64 each)
+        - bit width of every block (u8 each)
+        - payload: packed gaps, ``BLOCK_SIZE * width / 8`` bytes per block,
+          LSB-first, followed by zero padding
+    """
+
+    @property
+    def extension(self) -> str:
+        """File extension for packed u64 files."""
+        return ".pu64"
+
+    def write(self, feature_name: str, ids: np.ndarray) -> Path:
+        """Write sorted unique IDs to a .pu64 file.
+
+        Args:
+            feature_name: Name of the feature
+            ids: Sorted unique uint64 array of node IDs
+
+        Returns:
+            Path to the written index file
+        """
+        output_path = self.get_output_path(feature_name)
+
+        ids = ids.astype(np.uint64, copy=False)
+        count = len(ids)
+        num_blocks = -(-count // BLOCK_SIZE)
+
+        # Gaps minus one within each block; the first slot of a block is 0
+        # and the tail of the last block is zero padding
+        gaps = np.zeros(num_blocks * BLOCK_SIZE, dtype=np.uint64)
+        if count > 1:
+            np.subtract(ids[1:], ids[:-1], out=gaps[1:count])
+            gaps[1:count] -= np.uint64(1)
+        gaps = gaps.reshape(num_blocks, BLOCK_SIZE)
+        gaps[:, 0] = 0
+
+        widths = _bit_widths(gaps.max(axis=1))
+        offsets = np.zeros(num_blocks + 1, dtype=np.uint64)
+        np.cumsum(widths.astype(np.uint64) * np.uint64(BLOCK_SIZE // 8), out=offsets[1:])
+
+        payload = np.zeros(int(offsets[-1]) + _PADDING, dtype=np.uint8)
+        for width in np.unique(widths).tolist():
+            if width == 0:
+                continue
+            bit_index = np.arange(width, dtype=np.uint64)
+            block_bytes = np.arange(BLOCK_SIZE * width // 8)
+            rows = np.flatnonzero(widths == width)
+            for start in range(0, len(rows), _PACK_BATCH):
+                batch = rows[start : start + _PACK_BATCH]
+                bits = ((gaps[batch][:, :, None] >> bit_index) & np.uint64(1)).astype(np.uint8)
+                packed = np.packbits(bits.reshape(len(batch), -1), axis=1, bitorder="little")
+                payload[offsets[batch].astype(np.intp)[:, None] + block_bytes] = packed
+
+        with open(output_path, "wb") as f:
+            f.write(_HEADER.pack(b"PKDU64\x00\x00", BLOCK_SIZE, num_blocks, count))
+            f.write(ids[::BLOCK_SIZE].astype("<u8").tobytes())
+            f.write(offsets.astype("<u8", copy=False).tobytes())
+            f.write(widths.tobytes())
+            f.write(payload.tobytes())
+
+        return output_path
@@ -1,18 +1,182 @@
 """Roaring bitmap index writer."""
 
+from __future__ import annotations
+
+import array
 from pathlib import Path
+from typing import Iterable
 
 import numpy as np
-from pyroaring import BitMap
+from pyroaring import BitMap, BitMap64
 
 from osm_node.writers.base import BaseWriter
 
+# Number of IDs collected by a RoaringBuilder before they are sorted and added
+DEFAULT_BATCH_SIZE = 1_000_000
+
+# Average run length from which adding each run as a range beats bulk insertion
+MIN_RANGE_RUN_LENGTH = 64
+
+# Leading IDs inspected to estimate the average run length of a sorted set
+_RUN_SAMPLE_SIZE = 65_536
+
+
+class RoaringBuilder:
+    """Collects node IDs straight into a roaring bitmap.
+
+    An alternative to ``ChunkedIdBuffer`` when only a roaring index is
+    written: the bitmap deduplicates by itself, so IDs never go through the
+    spill, sort and merge pipeline, and memory is bounded by the compressed
+    bitmap rather than by the number of IDs added.
+
+    IDs are added in batches: each batch is sorted first, since CRoaring
+    inserts sorted values container by container but is several times
+    slower on unordered ones. The bitmap stays a 32-bit ``BitMap`` until an
+    ID needs more bits, then becomes a ``BitMap64``.
+    """
+
+    def __init__(self, batch_size: int = DEFAULT_BATCH_SIZE):
+        """Initialize the builder.
+
+        Args:
+            batch_size: Number of IDs collected before they are sorted and
+                added to the bitmap
+        """
+        self.batch_size = batch_size
+        self.batch = array.array("Q")
+        self.bitmap: BitMap | BitMap64 = BitMap()
+        self._added_count = 0
+
+    def add(self, node_id: int) -> None:
+        """Add a node ID.
+
+        Args:
+            node_id: Node ID to add
+        """
+        self.batch.append(node_id)
+        if len(self.batch) >= self.batch_size:
+            self.flush()
+
+    def add_many(self, node_ids: Iterable[int]) -> None:
+        """Add several node IDs at once.
+
+        Args:
+            node_ids: uint64 array, or any iterable of node IDs
+        """
+        ids = np.ascontiguousarray(node_ids, dtype=np.uint64)
+        self.batch.frombytes(memoryview(ids).cast("B"))
+        if len(self.batch) >= self.batch_size:
+            self.flush()
+
+    @property
+    def total_count(self) -> int:
+        """Number of IDs added so far, including duplicates."""
+        return self._added_count + len(self.batch)
+
+    def flush(self) -> None:
+        """Add the batched IDs to the bitmap."""
+        if not self.batch:
+            return
+
+        ids = np.frombuffer(self.batch, dtype=np.uint64)
+        ids.sort()
+
+        if isinstance(self.bitmap, BitMap) and ids[-1] > 0xFFFFFFFF:
+            # Switch to 64 bits, keeping the IDs collected so far
+            low_ids = np.frombuffer(self.bitmap.to_array(), dtype=np.uint32)
+            self.bitmap = BitMap64(_to_array(low_ids, "Q"))
+
+        if isinstance(self.bitmap, BitMap64):
+            self.bitmap.update(_to_array(ids, "Q"))
+        else:
+            self.bitmap.update(_to_array(ids, "I"))
+
+        self._added_count += len(self.batch)
+        self.batch = array.array("Q")
+
+    def finish_flushes(self) -> None:
+        """Add the batched IDs to the bitmap.
+
+        Alias of ``flush``, so that ``extract_features`` can finish every
+        buffer the same way, whether it is a ``ChunkedIdBuffer`` or a builder.
+        """
+        self.flush()
+
+    def to_bitmap(self) -> BitMap | BitMap64:
+        """Get the bitmap of all IDs added.
+
+        Returns:
+            32-bit bitmap if every ID fits in 32 bits, else a 64-bit bitmap
+        """
+        self.flush()
+        return self.bitmap
+
+    def __len__(self) -> int:
+        """Get the number of unique IDs added, leaving the batch pending."""
+        if not self.batch:
+            return len(self.bitmap)
+
+        pending = np.unique(np.frombuffer(self.batch, dtype=np.uint64))
+        if isinstance(self.bitmap, BitMap64):
+            return self.bitmap.union_cardinality(BitMap64(_to_array(pending, "Q")))
+
+        # IDs beyond 32 bits cannot be in the 32-bit bitmap yet
+        num_small = int(pending.searchsorted(np.uint64(0xFFFFFFFF), side="right"))
+        small = BitMap(_to_array(pending[:num_small], "I"))
+        return self.bitmap.union_cardinality(small) + len(pending) - num_small
+
+
+def _to_array(ids: np.ndarray, typecode: str) -> array.array:
+    """Copy IDs into an ``array.array``, pyroaring's fastest bulk input.
+
+    The array is allocated once and filled (and narrowed, for ``"I"``) in a
+    single NumPy pass, without an intermediate copy. pyroaring reads NumPy
+    arrays element by element, several times slower.
+
+    Args:
+        ids: uint64 array; values must fit the target type
+        typecode: ``"I"`` for uint32 or ``"Q"`` for uint64
+
+    Returns:
+        array of the same IDs
+    """
+    buf = array.array(typecode, [0]) * len(ids)
+    np.frombuffer(buf, dtype=np.uint32 if typecode == "I" else np.uint64)[:] = ids
+    return buf
+
+
+def _run_bounds(ids: np.ndarray) -> tuple[np.ndarray, np.ndarray] | None:
+    """Find the runs of consecutive IDs in a sorted array, if they are long.
+
+    A prefix of the array is checked first, so sparse sets - the common case
+    for OSM features - skip the full pass over the array.
+
+    Args:
+        ids: Sorted unique uint64 array
+
+    Returns:
+        Inclusive first and last ID of every run, or None if the runs average
+        fewer than ``MIN_RANGE_RUN_LENGTH`` IDs
+    """
+    sample = ids[:_RUN_SAMPLE_SIZE]
+    sample_runs = 1 + np.count_nonzero(sample[1:] - sample[:-1] != 1)
+    if len(sample) < sample_runs * MIN_RANGE_RUN_LENGTH:
+        return None
+
+    breaks = np.flatnonzero(ids[1:] - ids[:-1] != 1)
+    if len(ids) < (len(breaks) + 1) * MIN_RANGE_RUN_LENGTH:
+        return None
+    firsts = np.concatenate((ids[:1], ids[breaks + 1]))
+    lasts = np.concatenate((ids[breaks], ids[-1:]))
+    return firsts, lasts
+
 
 class RoaringWriter(BaseWriter):
     """Writer for roaring bitmap index files.
 
     Uses pyroaring to create compressed bitmap representations
     of node ID sets. Very compact and supports O(1) membership tests.
+    Sets with IDs beyond 32 bits are written as a ``BitMap64``.
     """
 
     @property
@@ -30,55 +194,49 @@ class RoaringWriter(BaseWriter):
         Returns:
             Path to the written index file
         """
-        output_path = self.get_output_path(feature_name)
-
-        # pyroaring's BitMap64 handles 64-bit integers
-        # Standard BitMap only handles 32-bit, so we need to handle this carefully
-        # For OSM node IDs which can exceed 32 bits, we use a workaround:
-        # We'll check if IDs fit in 32 bits, otherwise we fall back to storing
-        # both high and low parts
-
         if len(ids) == 0:
             # Empty bitmap
-            bm = BitMap()
-            output_path.write_bytes(bm.serialize())
-            return output_path
+            return self.write_bitmap(feature_name, BitMap())
+
+        # BaseWriter.write takes sorted unique IDs, as produced by
+        # ChunkedIdBuffer.sorted_ids, so the last one is the largest - no
+        # need to scan the whole array
+        max_id = int(ids[-1])
+
+        runs = _run_bounds(ids)
+        if runs is not None:
+            # Dense sets are mostly long runs, added a range at a time. The
+            # last ID is added on its own: the exclusive end of a run ending
+            # at 2**64 - 1 would overflow
+            bm = BitMap() if max_id <= 0xFFFFFFFF else BitMap64()
+            for first, last in zip(runs[0].tolist(), runs[1].tolist()):
+                bm.add_range(first, last)
+                bm.add(last)
+        elif max_id <= 0xFFFFFFFF:
+            # All IDs fit in 32 bits - the standard BitMap is the most compact.
+            # The IDs are narrowed straight into the constructor's input,
+            # without a uint32 NumPy temporary
+            bm = BitMap(_to_array(ids, "I"))
+        else:
+            # Larger IDs go into a BitMap64 (portable CRoaring 64-bit format)
+            bm = BitMap64(_to_array(ids, "Q"))
 
-        max_id = ids.max() if len(ids) > 0 else 0
+        return self.write_bitmap(feature_name, bm)
 
-        if max_id <= 0xFFFFFFFF:
-            # All IDs fit in 32 bits - use standard BitMap
-            bm = BitMap(ids.astype(np.uint32))
-            output_path.write_bytes(bm.serialize())
-        else:
-            # Some IDs exceed 32 bits - use a two-file approach
-            # Store high 32 bits and low 32 bits separately
-            # This is a pragmatic workaround for pyroaring's 32-bit limitation
-            high = (ids >> 32).astype(np.uint32)
-            low = (ids & 0xFFFFFFFF).astype(np.uint32)
-
-            # Group by high bits
-            unique_highs = np.unique(high)
-
-            # Write a custom format:
-            # - 8 bytes: magic "ROAR64\x00\x00"
-            # - 4 bytes: number of high groups
-            # For each group:
-            #   - 4 bytes: high value
-            #   - 4 bytes: size of serialized bitmap
-            #   - N bytes: serialized bitmap of low values
-            with open(output_path, "wb") as f:
-                f.write(b"ROAR64\x00\x00")
-                f.write(len(unique_highs).to_bytes(4, "little"))
-
-                for h in unique_highs:
-                    mask = high == h
-                    low_vals = low[mask]
-                    bm = BitMap(low_vals)
-                    serialized = bm.serialize()
-
-                    f.write(int(h).to_bytes(4, "little"))
-                    f.write(len(serialized).to_bytes(4, "little"))
-                    f.write(serialized)
+    def write_bitmap(self, feature_name: str, bitmap: BitMap | BitMap64) -> Path:
+        """Write an already built bitmap to a .roar file.
+
+        Args:
+            feature_name: Name of the feature
+            bitmap: Bitmap of the feature's node IDs; it is run-optimized in place
+
+        Returns:
+            Path to the written index file
+        """
+        output_path = self.get_output_path(feature_name)
+
+        # Runs of consecutive IDs serialize far smaller as run containers
+        bitmap.run_optimize()
+        output_path.write_bytes(bitmap.serialize())
 
         return output_path
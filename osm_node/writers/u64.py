@@ -6,6 +6,9 @@ import numpy as np
 
 from osm_node.writers.base import BaseWriter
 
+# Bytes handed to each write call
+WRITE_CHUNK_BYTES = 64 << 20
+
 
 class SortedU64Writer(BaseWriter):
     """Writer for sorted uint64 index files.
@@ -31,11 +34,16 @@ class SortedU64Writer(BaseWriter):
         """
         output_path = self.get_output_path(feature_name)
 
-        # Ensure correct dtype
-        if ids.dtype != np.uint64:
-            ids = ids.astype(np.uint64)
-
-        # Write as raw little-endian uint64
-        ids.tofile(output_path)
+        # tofile falls back to a per-element loop on non-contiguous arrays, so
+        # write a contiguous little-endian buffer instead; already-matching
+        # input is used as-is, without a copy
+        ids = np.ascontiguousarray(ids, dtype="<u8")
+
+        # Unbuffered: each slice goes to the kernel in one write call, without
+        # passing through Python's buffered writer; raw writes may be short
+        with open(output_path, "wb", buffering=0) as f, memoryview(ids).cast("B") as view:
+            written = 0
+            while written < len(view):
+                written += f.write(view[written : written + WRITE_CHUNK_BYTES])
 
         return output_path
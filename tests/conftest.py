@@ -0,0 +1,43 @@
+"""Shared test fixtures."""
+
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Callable
+
+import numpy as np
+import osmium
+import pytest
+
+
+@pytest.fixture(scope="session")
+def random_ids() -> dict[int, np.ndarray]:
+    """Unsorted uint64 node IDs with repeats, keyed by size.
+
+    Built once per session; tests write them into their own tmp_path. The
+    arrays are read-only so no test can change them for the others.
+    """
+    rng = np.random.default_rng(0)
+    arrays = {}
+    for size in (1_000, 100_000):
+        ids = rng.integers(0, 2**40, size, dtype=np.uint64)
+        # Repeat a tenth of the IDs so deduplication is exercised
+        ids[: size // 10] = ids[size // 10 : size // 5]
+        ids.flags.writeable = False
+        arrays[size] = ids
+    return arrays
+
+
+@pytest.fixture(scope="session")
+def write_pbf() -> Callable[[Path, list[dict]], None]:
+    """Function writing a small PBF with one node per tag dict (IDs starting at 1)."""
+
+    def write(path: Path, node_tags: list[dict]) -> None:
+        writer = osmium.SimpleWriter(str(path))
+        try:
+            for i, tags in enumerate(node_tags, start=1):
+                writer.add_node(osmium.osm.mutable.Node(id=i, location=(1.0, 1.0), tags=tags))
+        finally:
+            writer.close()
+
+    return write
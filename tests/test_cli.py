@@ -0,0 +1,103 @@
+"""Tests for CLI module."""
+
+from __future__ import annotations
+
+from click.testing import CliRunner
+
+from osm_node import cli
+from osm_node.cli import main
+from osm_node.index import RoaringIndex, SortedU64Index
+
+
+class TestBuild:
+    """Tests for the build command."""
+
+    def test_parallel_build_external_sort(self, tmp_path, write_pbf):
+        """Test that features sorted in parallel through spilled chunks stay separate."""
+        pbf = tmp_path / "test.osm.pbf"
+        write_pbf(
+            pbf,
+            [
+                {"highway": "traffic_signals"},
+                {"highway": "stop"},
+                {"traffic_calming": "bump"},
+                {"highway": "traffic_signals"},
+                {"highway": "stop"},
+                {"traffic_calming": "hump"},
+            ],
+        )
+        out = tmp_path / "out"
+
+        result = CliRunner().invoke(
+            main,
+            [
+                "build",
+                "--pbf", str(pbf),
+                "--out", str(out),
+                "--tmp", str(tmp_path / "tmp"),
+                "--flush-threshold", "1",
+                "--in-memory-threshold", "0",
+                "--jobs", "3",
+            ],
+        )
+
+        assert result.exit_code == 0, result.output
+        u64 = SortedU64Index.load_dir(out)
+        roar = RoaringIndex.load_dir(out)
+        for feature, ids in (("signals", [1, 4]), ("stops", [2, 5]), ("calming", [3, 6])):
+            assert u64.features[feature].tolist() == ids
+            assert roar.count(feature, ids) == 2
+            assert roar.get_size(feature) == 2
+
+    def test_in_memory_budget_split_between_jobs(self, tmp_path, monkeypatch, write_pbf):
+        """Test that each parallel job gets its share of the in-memory threshold."""
+        pbf = tmp_path / "test.osm.pbf"
+        write_pbf(pbf, [{"highway": "traffic_signals"}, {"highway": "stop"}])
+        thresholds = []
+        extract_features = cli.extract_features
+
+        def recording_extract(*args, **kwargs):
+            thresholds.append(args[4])
+            return extract_features(*args, **kwargs)
+
+        monkeypatch.setattr("osm_node.cli.extract_features", recording_extract)
+
+        result = CliRunner().invoke(
+            main,
+            [
+                "build",
+                "--pbf", str(pbf),
+                "--out", str(tmp_path / "out"),
+                "--features", "signals,stops,calming",
+                "--in-memory-threshold", "3000",
+                "--jobs", "4",
+            ],
+        )
+
+        assert result.exit_code == 0, result.output
+        # Three features cap the jobs at three
+        assert thresholds == [1000]
+
+    def test_roaring_only_build_skips_sorting(self, tmp_path, write_pbf):
+        """Test that a roar-only build collects IDs straight into bitmaps."""
+        pbf = tmp_path / "test.osm.pbf"
+        write_pbf(pbf, [{"highway": "traffic_signals"}, {}, {"highway": "traffic_signals"}])
+        out = tmp_path / "out"
+
+        result = CliRunner().invoke(
+            main,
+            [
+                "build",
+                "--pbf", str(pbf),
+                "--out", str(out),
+                "--format", "roar",
+                "--features", "signals,stops",
+                "--flush-threshold", "1",
+            ],
+        )
+
+        assert result.exit_code == 0, result.output
+        assert sorted(p.name for p in out.iterdir()) == ["signals.roar", "stops.roar"]
+        roar = RoaringIndex.load_dir(out)
+        assert roar.count("signals", [1, 2, 3]) == 2
+        assert roar.get_size("stops") == 0
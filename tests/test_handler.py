@@ -2,10 +2,18 @@
 
 from __future__ import annotations
 
+import osmium
 import pytest
 
-from osm_node.handler import OsmiumTaggingHandler
-from osm_node.schema import FeatureSpec, default_feature_specs
+from osm_node.handler import OsmiumTaggingHandler, _build_prefilter, extract_features
+from osm_node.schema import FeatureSpec, default_feature_specs, get_feature_specs
+
+
+class MockTagList(dict):
+    """Mock osmium TagList: a dict that iterates over (key, value) pairs."""
+
+    def __iter__(self):
+        return iter(self.items())
 
 
 class MockNode:
@@ -13,7 +21,7 @@ class MockNode:
 
     def __init__(self, node_id: int, tags: dict | None = None):
         self.id = node_id
-        self.tags = tags if tags else {}
+        self.tags = MockTagList(tags if tags else {})
 
 
 class TestOsmiumTaggingHandler:
@@ -69,6 +77,45 @@ class TestOsmiumTaggingHandler:
         assert handler.buffers["highway_any"].total_count == 1
         assert handler.buffers["signals"].total_count == 1
 
+    def test_node_matching_several_tags_of_one_feature(self, tmp_path):
+        """Test that a node matching a feature on two tags is added once."""
+        specs = default_feature_specs()
+        handler = OsmiumTaggingHandler(specs, tmp_path)
+
+        node = MockNode(123, {"highway": "traffic_signals", "crossing": "traffic_signals"})
+        handler.node(node)
+
+        assert handler.nodes_matched == 1
+        assert handler.buffers["signals"].total_count == 1
+
+    def test_mixed_declarative_and_predicate_specs(self, tmp_path):
+        """Test that tag_matches dispatch and predicate fallback combine."""
+        specs = {
+            "stops": FeatureSpec("stops", lambda t: False, tag_matches=(("highway", "stop"),)),
+            "named": FeatureSpec("named", lambda t: "name" in t),
+        }
+        handler = OsmiumTaggingHandler(specs, tmp_path)
+
+        handler.node(MockNode(1, {"highway": "stop", "name": "Main St"}))
+        handler.node(MockNode(2, {"name": "Elm St"}))
+        handler.node(MockNode(3, {"highway": "give_way"}))
+
+        assert handler.buffers["stops"].total_count == 1
+        assert handler.buffers["named"].total_count == 2
+        assert handler.nodes_matched == 2
+
+    def test_predicate_receives_tag_list(self, tmp_path):
+        """Test that predicates get the node's tags without a dict copy."""
+        seen = []
+        specs = {"any": FeatureSpec("any", lambda t: seen.append(t) or True)}
+        handler = OsmiumTaggingHandler(specs, tmp_path)
+
+        node = MockNode(1, {"highway": "stop"})
+        handler.node(node)
+
+        assert seen == [node.tags]
+        assert seen[0] is node.tags
+
     def test_get_statistics(self, tmp_path):
         """Test statistics reporting."""
         specs = default_feature_specs()
@@ -106,3 +153,57 @@ class TestOsmiumTaggingHandler:
         assert count == 3
         loaded = np.fromfile(out_path, dtype="<u8")
         np.testing.assert_array_equal(loaded, [100, 200, 300])
+
+
+@pytest.fixture(scope="module")
+def pbf_path(tmp_path_factory, write_pbf):
+    """Create a PBF with a mix of interesting and uninteresting nodes, once per module."""
+    path = tmp_path_factory.mktemp("pbf") / "test.osm.pbf"
+    write_pbf(
+        path,
+        [
+            {},
+            {"highway": "traffic_signals"},
+            {"highway": "stop"},
+            {"traffic_calming": "hump"},
+            {"crossing": "traffic_signals", "highway": "crossing"},
+            {"amenity": "cafe"},
+            {"railway": "level_crossing"},
+        ],
+    )
+    return path
+
+
+class TestExtractFeatures:
+    """Tests for extract_features on a real PBF file."""
+
+    def test_key_filter_skips_uninteresting_nodes(self, pbf_path, tmp_path):
+        """Test that only nodes with interesting keys reach the handler."""
+        handler = extract_features(pbf_path, default_feature_specs(), tmp_path / "tmp")
+
+        stats = handler.get_statistics()
+        # Untagged, amenity and railway nodes are dropped in C++
+        assert stats["nodes_processed"] == 4
+        assert stats["nodes_matched"] == 4
+        assert stats["feature_counts"] == {"signals": 2, "stops": 1, "calming": 1}
+
+    def test_tag_filter_for_exact_matches(self, pbf_path, tmp_path):
+        """Test that exact-only specs let just the matching nodes through."""
+        specs = get_feature_specs(["signals", "stops"])
+        assert isinstance(_build_prefilter(specs), osmium.filter.TagFilter)
+
+        handler = extract_features(pbf_path, specs, tmp_path / "tmp")
+
+        # highway=crossing without a signal and the calming node are dropped
+        assert handler.nodes_processed == 3
+        assert handler.get_statistics()["feature_counts"] == {"signals": 2, "stops": 1}
+
+    def test_no_filter_without_interesting_keys(self, pbf_path, tmp_path):
+        """Test that specs without declared keys see every node."""
+        specs = {"rail": FeatureSpec("rail", lambda t: t.get("railway") == "level_crossing")}
+        assert _build_prefilter(specs) is None
+
+        handler = extract_features(pbf_path, specs, tmp_path / "tmp")
+
+        assert handler.nodes_processed == 7
+        assert handler.buffers["rail"].total_count == 1
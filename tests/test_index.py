@@ -1,10 +1,13 @@
 """Tests for index modules."""
 
+import struct
+
 import numpy as np
 import pytest
+from pyroaring import BitMap
 
-from osm_node.index import RoaringIndex, SortedU64Index
-from osm_node.writers import RoaringWriter, SortedU64Writer
+from osm_node.index import PackedU64Index, RoaringIndex, SortedU64Index
+from osm_node.writers import PackedU64Writer, RoaringWriter, SortedU64Writer
 
 
 class TestSortedU64Index:
@@ -35,6 +38,20 @@ class TestSortedU64Index:
         assert populated_index.contains("signals", 999) is False
         assert populated_index.contains("signals", 0) is False
 
+    def test_contains_key_types(self, populated_index):
+        """Test contains with int, NumPy and out-of-range keys."""
+        assert populated_index.contains("signals", np.uint64(300)) is True
+        assert populated_index.contains("signals", np.int64(300)) is True
+        assert populated_index.contains("signals", -1) is False
+        assert populated_index.contains("signals", 2**64) is False
+
+    def test_contains_exact_above_2_53(self, tmp_path):
+        """Test that keys above 2**53 are compared exactly, not as floats."""
+        SortedU64Writer(tmp_path).write("big", np.array([2**60], dtype=np.uint64))
+        index = SortedU64Index.load_dir(tmp_path)
+        assert index.contains("big", 2**60) is True
+        assert index.contains("big", 2**60 + 1) is False
+
     def test_contains_empty_feature(self, populated_index):
         """Test contains on empty feature."""
         assert populated_index.contains("empty", 100) is False
@@ -76,6 +93,26 @@ class TestSortedU64Index:
         assert counts["stops"] == 2  # 150, 250
         assert counts["empty"] == 0
 
+    def test_count_accepts_arrays_and_iterators(self, populated_index):
+        """Test count with a uint64 array, a generator and beyond-the-end IDs."""
+        ids = np.array([100, 200, 600, 2**63], dtype=np.uint64)
+        assert populated_index.count("signals", ids) == 2
+        assert populated_index.count_array("signals", ids) == 2
+        assert populated_index.count("signals", (i for i in [300, 301, 500])) == 2
+
+    def test_count_all_with_generator(self, populated_index):
+        """Test count_all consumes a one-shot iterator only once."""
+        counts = populated_index.count_all(i for i in [100, 150, 200])
+        assert counts == {"signals": 2, "stops": 1, "empty": 0}
+
+    def test_count_all_parallel_matches_sequential(self, populated_index, monkeypatch):
+        """Test that counting features on a thread pool gives the same counts."""
+        monkeypatch.setattr("os.cpu_count", lambda: 4)
+        node_ids = [100, 150, 200, 250, 300, 301]
+        parallel = populated_index.count_all(node_ids)
+        assert parallel == populated_index.count_all(node_ids, parallel=False)
+        assert list(parallel) == ["empty", "signals", "stops"]
+
     def test_get_size(self, populated_index):
         """Test get_size returns correct counts."""
         assert populated_index.get_size("signals") == 5
@@ -143,6 +180,37 @@ class TestRoaringIndex:
         assert counts["stops"] == 2
         assert counts["empty"] == 0
 
+    def test_count_repeats_and_out_of_range(self, populated_index):
+        """Test that repeated IDs count each time and 64-bit IDs never match."""
+        ids = np.array([100, 100, 200, 999, 2**40 + 100], dtype=np.uint64)
+        assert populated_index.count("signals", ids) == 3
+        assert populated_index.count("empty", ids) == 0
+
+    def test_count_skips_ids_outside_uint64(self, populated_index):
+        """Test that negative and too-large IDs are not counted, as contains says."""
+        assert populated_index.count("signals", [-1, 100]) == 1
+        assert populated_index.count("signals", [2**64, 100, 200]) == 2
+        assert populated_index.count("signals", iter([-5, 2**70, 300])) == 1
+        assert populated_index.count("signals", np.array([-1, 100], dtype=np.int64)) == 1
+        assert populated_index.contains("signals", -1) is False
+        assert populated_index.contains("signals", 2**64) is False
+
+    def test_load_single_file(self, tmp_path):
+        """Test loading a single memory-mapped file."""
+        writer = RoaringWriter(tmp_path)
+        writer.write("test", np.array([1, 2, 3], dtype=np.uint64))
+
+        index = RoaringIndex.load_file(tmp_path / "test.roar")
+        assert index.contains("test", 2) is True
+        assert index.contains("test", 4) is False
+
+    def test_load_zero_byte_file(self, tmp_path):
+        """Test that a zero-byte file loads as an empty feature."""
+        (tmp_path / "blank.roar").write_bytes(b"")
+
+        index = RoaringIndex.load_file(tmp_path / "blank.roar")
+        assert index.get_size("blank") == 0
+
 
 class TestRoaringIndex64Bit:
     """Tests for RoaringIndex with 64-bit IDs."""
@@ -167,7 +235,82 @@ class TestRoaringIndex64Bit:
         count = large_id_index.count("large", [2**40, 2**40 + 1, 2**50])
         assert count == 2
 
+    def test_count_large_ids_bulk(self, large_id_index):
+        """Test counting unsorted, repeated queries across several high groups."""
+        ids = np.array(
+            [2**50, 100, 2**40 + 100, 2**40, 2**40 + 100, 2**50 + 1, 2**45], dtype=np.uint64
+        )
+        assert large_id_index.count("large", ids) == 4
+        assert large_id_index.count("large", []) == 0
+
     def test_is_64bit_flag(self, large_id_index):
         """Test that 64-bit flag is set correctly."""
         stats = large_id_index.get_statistics()
         assert stats["large"]["is_64bit"] is True
+
+    def test_load_legacy_roar64(self, tmp_path):
+        """Test that files in the legacy ROAR64 layout still load."""
+        groups = {2**8: [0, 100], 0: [5]}
+        data = b"ROAR64\x00\x00" + struct.pack("<I", len(groups))
+        for high, lows in groups.items():
+            serialized = BitMap(lows).serialize()
+            data += struct.pack("<II", high, len(serialized)) + serialized
+        (tmp_path / "legacy.roar").write_bytes(data)
+
+        index = RoaringIndex.load_dir(tmp_path)
+        assert index.get_size("legacy") == 3
+        assert index.contains("legacy", 5) is True
+        assert index.contains("legacy", 2**40 + 100) is True
+        assert index.count("legacy", [2**40, 2**40 + 1, 5, 6]) == 2
+
+    def test_bucket_count_like_32bit_cookie(self, tmp_path):
+        """Test that 64-bit files whose bucket count looks like a 32-bit cookie load as 64-bit."""
+        writer = RoaringWriter(tmp_path)
+        for buckets in (12346, 12347):
+            ids = np.arange(buckets, dtype=np.uint64) << np.uint64(32)
+            writer.write(f"b{buckets}", ids + np.uint64(7))
+
+        index = RoaringIndex.load_dir(tmp_path)
+        for buckets in (12346, 12347):
+            assert index.get_statistics()[f"b{buckets}"]["is_64bit"] is True
+            assert index.get_size(f"b{buckets}") == buckets
+            assert index.contains(f"b{buckets}", (5 << 32) + 7) is True
+
+
+class TestPackedU64Index:
+    """Tests for PackedU64Index."""
+
+    @pytest.fixture
+    def populated_index(self, tmp_path):
+        """Create a test index spanning several blocks."""
+        writer = PackedU64Writer(tmp_path)
+        writer.write("signals", np.array([100, 200, 300, 400, 500], dtype=np.uint64))
+        writer.write("dense", np.arange(2**40, 2**40 + 300, dtype=np.uint64))
+        writer.write("empty", np.array([], dtype=np.uint64))
+        return PackedU64Index.load_dir(tmp_path)
+
+    def test_load_dir(self, populated_index):
+        """Test loading indices from directory."""
+        assert set(populated_index.available_features()) == {"signals", "dense", "empty"}
+        assert populated_index.get_size("dense") == 300
+
+    def test_contains(self, populated_index):
+        """Test membership, including past the end of a partial last block."""
+        assert populated_index.contains("signals", 300) is True
+        assert populated_index.contains("signals", 301) is False
+        assert populated_index.contains("signals", 0) is False
+        assert populated_index.contains("dense", 2**40 + 299) is True
+        assert populated_index.contains("dense", 2**40 + 300) is False
+        assert populated_index.contains("empty", 100) is False
+
+    def test_count(self, populated_index):
+        """Test counting with repeats and out-of-range IDs."""
+        assert populated_index.count("signals", [100, 100, 101, 500, 999]) == 3
+        ids = np.arange(2**40 - 5, 2**40 + 310, dtype=np.uint64)
+        assert populated_index.count("dense", ids) == 300
+        assert populated_index.count("empty", [100]) == 0
+
+    def test_unknown_feature_raises(self, populated_index):
+        """Test queries on an unknown feature raise."""
+        with pytest.raises(KeyError, match="Feature 'unknown' not loaded"):
+            populated_index.count("unknown", [100])
@@ -20,6 +20,11 @@ class TestFeatureSpec:
         assert spec.predicate({"key": "value"}) is True
         assert spec.predicate({}) is False
 
+    def test_feature_spec_default_keys(self):
+        """Test that interesting_keys defaults to empty."""
+        spec = FeatureSpec("test", lambda tags: True)
+        assert spec.interesting_keys == ()
+
     def test_feature_spec_frozen(self):
         """Test that FeatureSpec is immutable."""
         spec = FeatureSpec("test", lambda tags: True)
@@ -60,6 +65,32 @@ class TestDefaultPredicates:
         assert pred({"traffic_calming": "table"}) is True
         assert pred({}) is False
 
+    def test_interesting_keys(self):
+        """Test that default specs declare the keys their predicates read."""
+        specs = default_feature_specs()
+        assert specs["signals"].interesting_keys == ("highway", "crossing")
+        assert specs["stops"].interesting_keys == ("highway",)
+        assert specs["calming"].interesting_keys == ("traffic_calming",)
+
+    def test_tag_matches_agree_with_predicates(self):
+        """Test that declarative tag_matches match the same tags as predicates."""
+        samples = [
+            {"highway": "traffic_signals"},
+            {"crossing": "traffic_signals"},
+            {"highway": "stop"},
+            {"highway": "give_way"},
+            {"highway": "crossing"},
+            {"railway": "level_crossing"},
+            {"traffic_calming": "hump"},
+            {"amenity": "cafe"},
+        ]
+        for spec in extended_feature_specs().values():
+            for tags in samples:
+                declared = any(
+                    k in tags and (v is None or tags[k] == v) for k, v in spec.tag_matches
+                )
+                assert declared == spec.predicate(tags), (spec.name, tags)
+
 
 class TestExtendedPredicates:
     """Tests for extended feature predicates."""
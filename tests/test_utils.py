@@ -1,17 +1,48 @@
 """Tests for utility functions."""
 
+import os
+from concurrent.futures import ThreadPoolExecutor
+
 import numpy as np
 import pytest
 
+from osm_node import utils
 from osm_node.utils import (
     ChunkedIdBuffer,
+    iter_ids_from_file,
     merge_sorted_files,
+    merge_sorted_runs,
     read_ids_from_file,
-    sort_and_unique_chunks,
+    sort_unique_u64,
+    uniq_sorted_u64,
     write_ids_to_file,
 )
 
 
+def record_drops(monkeypatch, out_path) -> list[tuple[int, int]]:
+    """Record each release of merge input pages against the merge output so far.
+
+    Args:
+        monkeypatch: pytest monkeypatch fixture
+        out_path: Path of the merge output file
+
+    Returns:
+        List that fills with (last ID of the dropped pages, last ID written)
+        pairs; the written ID is -1 while the output is empty
+    """
+    drops = []
+    drop_pages = utils._drop_pages
+
+    def recording_drop(mm, fd, offset, length):
+        dropped = int.from_bytes(os.pread(fd, 8, offset + length - 8), "little")
+        written = np.fromfile(out_path, dtype="<u8")
+        drops.append((dropped, int(written[-1]) if len(written) else -1))
+        drop_pages(mm, fd, offset, length)
+
+    monkeypatch.setattr("osm_node.utils._drop_pages", recording_drop)
+    return drops
+
+
 class TestWriteReadIds:
     """Tests for write_ids_to_file and read_ids_from_file."""
 
@@ -26,6 +57,14 @@ class TestWriteReadIds:
         loaded = read_ids_from_file(path)
         np.testing.assert_array_equal(loaded, ids)
 
+    def test_written_bytes_are_little_endian(self, tmp_path):
+        """Test that files hold little-endian uint64 bytes, whatever the host order."""
+        path = tmp_path / "test.u64"
+        with open(path, "wb") as f:
+            write_ids_to_file(f, [1, 2**40])
+
+        assert path.read_bytes() == (1).to_bytes(8, "little") + (2**40).to_bytes(8, "little")
+
     def test_read_empty_file(self, tmp_path):
         """Test reading an empty file."""
         path = tmp_path / "empty.u64"
@@ -40,6 +79,18 @@ class TestWriteReadIds:
         loaded = read_ids_from_file(path)
         assert len(loaded) == 0
 
+    def test_iter_chunks_stay_valid(self, tmp_path):
+        """Test iterating a multi-page file; released chunks still read back."""
+        ids = np.arange(5000, dtype=np.uint64)
+        path = tmp_path / "ids.u64"
+        ids.astype("<u8").tofile(path)
+
+        chunks = list(iter_ids_from_file(path, chunk_size=1500))
+
+        assert [len(chunk) for chunk in chunks] == [1500, 1500, 1500, 500]
+        np.testing.assert_array_equal(np.concatenate(chunks), ids)
+        assert list(iter_ids_from_file(tmp_path / "missing.u64")) == []
+
 
 class TestMergeSortedFiles:
     """Tests for merge_sorted_files."""
@@ -75,6 +126,82 @@ class TestMergeSortedFiles:
         loaded = np.fromfile(out_path, dtype="<u8")
         np.testing.assert_array_equal(loaded, [100, 200, 300, 400])
 
+    def test_merge_across_blocks(self, tmp_path, monkeypatch):
+        """Test merging inputs that span many blocks, with duplicates across them."""
+        monkeypatch.setattr("osm_node.utils.MERGE_BLOCK_SIZE", 2)
+        rng = np.random.default_rng(0)
+        inputs = [np.sort(rng.integers(0, 40, 25, dtype=np.uint64)) for _ in range(4)]
+        paths = []
+        for i, ids in enumerate(inputs):
+            paths.append(tmp_path / f"{i}.u64")
+            ids.astype("<u8").tofile(paths[-1])
+        out_path = tmp_path / "merged.u64"
+
+        count = merge_sorted_files(paths, out_path)
+
+        expected = np.unique(np.concatenate(inputs))
+        assert count == len(expected)
+        np.testing.assert_array_equal(np.fromfile(out_path, dtype="<u8"), expected)
+
+    def test_merge_drops_pages_after_writing(self, tmp_path, monkeypatch):
+        """Test that merged input pages are released only once their IDs are written."""
+        monkeypatch.setattr("osm_node.utils.MERGE_BLOCK_SIZE", 512)
+        paths = [tmp_path / "even.u64", tmp_path / "odd.u64"]
+        np.arange(0, 4096, 2, dtype="<u8").tofile(paths[0])
+        np.arange(1, 4096, 2, dtype="<u8").tofile(paths[1])
+        out_path = tmp_path / "merged.u64"
+        drops = record_drops(monkeypatch, out_path)
+
+        count = merge_sorted_files(paths, out_path)
+
+        assert count == 4096
+        assert drops
+        assert all(dropped <= written for dropped, written in drops)
+
+    def test_merge_disjoint_files(self, tmp_path, monkeypatch):
+        """Test the concatenation path for disjoint files given out of order."""
+        monkeypatch.setattr("osm_node.utils.MERGE_BLOCK_SIZE", 2)
+        inputs = [[50, 50, 60, 70], [10, 20, 20, 30], [30, 40], []]
+        paths = []
+        for i, ids in enumerate(inputs):
+            paths.append(tmp_path / f"{i}.u64")
+            np.array(ids, dtype="<u8").tofile(paths[-1])
+        out_path = tmp_path / "merged.u64"
+
+        count = merge_sorted_files(paths, out_path)
+
+        assert count == 7
+        np.testing.assert_array_equal(
+            np.fromfile(out_path, dtype="<u8"), [10, 20, 30, 40, 50, 60, 70]
+        )
+        assert not any(p.exists() for p in paths)
+
+    def test_merge_disjoint_drops_pages_after_writing(self, tmp_path, monkeypatch):
+        """Test that the disjoint path releases input pages only once they are written."""
+        monkeypatch.setattr("osm_node.utils.MERGE_BLOCK_SIZE", 512)
+        paths = [tmp_path / "high.u64", tmp_path / "low.u64"]
+        np.arange(2048, 4096, dtype="<u8").tofile(paths[0])
+        np.arange(0, 2048, dtype="<u8").tofile(paths[1])
+        out_path = tmp_path / "merged.u64"
+        drops = record_drops(monkeypatch, out_path)
+
+        count = merge_sorted_files(paths, out_path)
+
+        assert count == 4096
+        assert drops
+        assert all(dropped <= written for dropped, written in drops)
+
+    def test_merge_sorted_runs_disjoint_and_overlapping(self, tmp_path):
+        """Test merge_sorted_runs with disjoint and with interleaved runs."""
+        out_path = tmp_path / "merged.u64"
+        disjoint = [np.array([5, 6], dtype=np.uint64), np.array([1, 2, 2], dtype=np.uint64)]
+        assert merge_sorted_runs(disjoint, out_path) == 4
+        np.testing.assert_array_equal(np.fromfile(out_path, dtype="<u8"), [1, 2, 5, 6])
+
+        overlapping = [np.array([1, 5], dtype=np.uint64), np.array([2, 5, 6], dtype=np.uint64)]
+        assert merge_sorted_runs(overlapping, out_path) == 4
+        np.testing.assert_array_equal(np.fromfile(out_path, dtype="<u8"), [1, 2, 5, 6])
+
     def test_merge_single_file(self, tmp_path):
         """Test merging a single file."""
         path = tmp_path / "single.u64"
@@ -96,42 +223,37 @@ class TestMergeSortedFiles:
         assert out_path.read_bytes() == b""
 
 
-class TestSortAndUniqueChunks:
-    """Tests for sort_and_unique_chunks."""
+class TestSortUniqueU64:
+    """Tests for sort_unique_u64."""
 
-    def test_sort_single_chunk(self, tmp_path):
-        """Test sorting a single unsorted chunk."""
-        chunk_path = tmp_path / "chunk.u64"
-        out_path = tmp_path / "sorted.u64"
+    def test_sort_and_dedup(self):
+        """Test sorting with duplicates."""
+        ids = np.array([300, 100, 200, 100, 300], dtype=np.uint64)
+        np.testing.assert_array_equal(sort_unique_u64(ids), [100, 200, 300])
 
-        np.array([300, 100, 200, 100], dtype="<u8").tofile(chunk_path)
+    def test_small_inputs(self):
+        """Test empty and single-element arrays."""
+        assert len(sort_unique_u64(np.array([], dtype=np.uint64))) == 0
+        np.testing.assert_array_equal(sort_unique_u64(np.array([7], dtype=np.uint64)), [7])
 
-        count = sort_and_unique_chunks([chunk_path], out_path, remove_chunks=False)
+    def test_large_ids(self):
+        """Test IDs beyond 2**53 keep full precision."""
+        ids = np.array([2**60 + 1, 2**60, 2**60 + 1], dtype=np.uint64)
+        np.testing.assert_array_equal(sort_unique_u64(ids), [2**60, 2**60 + 1])
 
-        assert count == 3
-        loaded = np.fromfile(out_path, dtype="<u8")
-        np.testing.assert_array_equal(loaded, [100, 200, 300])
 
-    def test_sort_multiple_chunks(self, tmp_path):
-        """Test sorting and merging multiple unsorted chunks."""
-        chunk1 = tmp_path / "chunk1.u64"
-        chunk2 = tmp_path / "chunk2.u64"
-        out_path = tmp_path / "sorted.u64"
+class TestUniqSortedU64:
+    """Tests for uniq_sorted_u64."""
 
-        np.array([300, 100], dtype="<u8").tofile(chunk1)
-        np.array([200, 100], dtype="<u8").tofile(chunk2)
+    def test_dedup_runs(self):
+        """Test that runs of equal IDs collapse to one."""
+        ids = np.array([1, 1, 1, 5, 9, 9, 2**63], dtype=np.uint64)
+        np.testing.assert_array_equal(uniq_sorted_u64(ids), [1, 5, 9, 2**63])
 
-        count = sort_and_unique_chunks([chunk1, chunk2], out_path, remove_chunks=False)
-
-        assert count == 3  # 100, 200, 300
-        loaded = np.fromfile(out_path, dtype="<u8")
-        np.testing.assert_array_equal(loaded, [100, 200, 300])
-
-    def test_empty_chunks(self, tmp_path):
-        """Test with no chunks."""
-        out_path = tmp_path / "sorted.u64"
-        count = sort_and_unique_chunks([], out_path)
-        assert count == 0
+    def test_small_inputs(self):
+        """Test empty and single-element arrays."""
+        assert len(uniq_sorted_u64(np.array([], dtype=np.uint64))) == 0
+        np.testing.assert_array_equal(uniq_sorted_u64(np.array([7], dtype=np.uint64)), [7])
 
 
 class TestChunkedIdBuffer:
@@ -191,3 +313,117 @@ class TestChunkedIdBuffer:
             buffer.add(i % 3)  # Will have duplicates
 
         assert buffer.total_count == 10
+
+    def test_spilled_finalize_matches_unique(self, tmp_path, random_ids):
+        """Test that spilled chunks merge to the same IDs as np.unique."""
+        ids = random_ids[100_000]
+        buffer = ChunkedIdBuffer("test", tmp_path, flush_threshold=8192, in_memory_threshold=0)
+        buffer.add_many(ids)
+        out_path = tmp_path / "out.u64"
+
+        count = buffer.finalize(out_path)
+
+        expected = np.unique(ids)
+        assert buffer.total_count == len(ids)
+        assert count == len(expected)
+        np.testing.assert_array_equal(np.fromfile(out_path, dtype="<u8"), expected)
+
+    def test_add_many(self, tmp_path):
+        """Test that batches are split at the flush threshold."""
+        buffer = ChunkedIdBuffer("test", tmp_path, flush_threshold=4, in_memory_threshold=0)
+
+        buffer.add(900)
+        buffer.add_many(np.array([500, 100, 400, 300, 100], dtype=np.uint64))
+        buffer.add_many([200, 600])
+        buffer.add_many([])
+
+        assert buffer.chunk_count == 2
+        assert buffer.total_count == 8
+        np.testing.assert_array_equal(
+            buffer.sorted_ids(), [100, 200, 300, 400, 500, 600, 900]
+        )
+
+    def test_total_count_survives_flush_and_sort(self, tmp_path):
+        """Test that total_count includes flushed and sorted IDs."""
+        buffer = ChunkedIdBuffer("test", tmp_path, flush_threshold=4)
+
+        for i in range(10):
+            buffer.add(i % 3)
+
+        assert buffer.chunk_count == 2
+        assert buffer.total_count == 10
+        buffer.sorted_ids()
+        assert buffer.total_count == 10
+
+    def test_in_memory_without_spill(self, tmp_path):
+        """Test that buffers under the threshold never write chunk files."""
+        buffer = ChunkedIdBuffer("test", tmp_path)
+
+        for node_id in (300, 100, 200, 100):
+            buffer.add(node_id)
+
+        np.testing.assert_array_equal(buffer.sorted_ids(), [100, 200, 300])
+        assert buffer.chunk_count == 0
+        assert list(tmp_path.iterdir()) == []
+
+    def test_sorted_ids_after_spill(self, tmp_path):
+        """Test sorted_ids merges spilled chunks with the in-memory tail."""
+        buffer = ChunkedIdBuffer("test", tmp_path, flush_threshold=2)
+
+        for node_id in (500, 100, 400, 100, 300):
+            buffer.add(node_id)
+
+        np.testing.assert_array_equal(buffer.sorted_ids(), [100, 300, 400, 500])
+        assert list(tmp_path.glob("*.u64")) == []
+
+    def test_background_flush_writes_sorted_chunks(self, tmp_path):
+        """Test that chunks flushed through an executor land sorted in their spans."""
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            buffer = ChunkedIdBuffer(
+                "test", tmp_path, flush_threshold=3, in_memory_threshold=0, executor=executor
+            )
+            for node_id in (500, 100, 500, 300, 100, 200):
+                buffer.add(node_id)
+
+            spans = buffer.get_chunk_spans()
+
+        assert buffer.executor is None
+        # Chunks are deduplicated within the space reserved for them
+        assert [(start, count) for _, start, count in spans] == [(0, 2), (3, 3)]
+        parts = read_ids_from_file(spans[0][0])
+        np.testing.assert_array_equal(parts[0:2], [100, 500])
+        np.testing.assert_array_equal(parts[3:6], [100, 200, 300])
+        np.testing.assert_array_equal(buffer.sorted_ids(), [100, 200, 300, 500])
+
+    def test_sorted_ids_external(self, tmp_path):
+        """Test sorted_ids above the in-memory threshold leaves no temp files."""
+        buffer = ChunkedIdBuffer("test", tmp_path, flush_threshold=2, in_memory_threshold=0)
+
+        for node_id in (500, 100, 400, 100, 300):
+            buffer.add(node_id)
+
+        np.testing.assert_array_equal(buffer.sorted_ids(), [100, 300, 400, 500])
+        assert list(tmp_path.iterdir()) == []
+
+    def test_sorted_ids_empty(self, tmp_path):
+        """Test that an empty buffer gives an empty array."""
+        buffer = ChunkedIdBuffer("test", tmp_path)
+
+        assert len(buffer.sorted_ids()) == 0
+        assert buffer.total_count == 0
+
+    def test_sorted_ids_spilled_match_unique(self, tmp_path, monkeypatch, random_ids):
+        """Test both spilled strategies of sorted_ids against np.unique."""
+        monkeypatch.setattr("osm_node.utils.MERGE_BLOCK_SIZE", 4096)
+        ids = random_ids[100_000]
+        expected = np.unique(ids)
+
+        for in_memory_threshold in (0, len(ids) * 8):
+            buffer = ChunkedIdBuffer(
+                "test", tmp_path, flush_threshold=8192, in_memory_threshold=in_memory_threshold
+            )
+            buffer.add_many(ids)
+
+            assert buffer.chunk_count == 12
+            np.testing.assert_array_equal(buffer.sorted_ids(), expected)
+            assert list(tmp_path.iterdir()) == []
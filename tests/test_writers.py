@@ -2,8 +2,10 @@
 
 import numpy as np
 import pytest
+from pyroaring import BitMap, FrozenBitMap64
 
-from osm_node.writers import RoaringWriter, SortedU64Writer
+from osm_node.index.packed import PackedIds
+from osm_node.writers import PackedU64Writer, RoaringBuilder, RoaringWriter, SortedU64Writer
 
 
 class TestSortedU64Writer:
@@ -41,6 +43,15 @@ class TestSortedU64Writer:
         loaded = np.fromfile(path, dtype="<u8")
         np.testing.assert_array_equal(loaded, ids)
 
+    def test_write_strided_big_endian(self, tmp_path):
+        """Test writing a non-contiguous, big-endian view."""
+        writer = SortedU64Writer(tmp_path)
+        ids = np.arange(0, 20, dtype=">u8")[::2]
+        path = writer.write("strided", ids)
+
+        loaded = np.fromfile(path, dtype="<u8")
+        np.testing.assert_array_equal(loaded, np.arange(0, 20, 2))
+
     def test_creates_directory(self, tmp_path):
         """Test that writer creates output directory if needed."""
         out_dir = tmp_path / "nested" / "path"
@@ -68,6 +79,16 @@ class TestRoaringWriter:
         data = path.read_bytes()
         assert not data.startswith(b"ROAR64")
 
+    def test_write_32bit_from_memmap(self, tmp_path):
+        """Test that memory-mapped uint64 IDs are narrowed into a 32-bit bitmap."""
+        ids = np.array([1, 2, 3, 2**32 - 1], dtype="<u8")
+        ids.tofile(tmp_path / "ids.u64")
+        mapped = np.memmap(tmp_path / "ids.u64", dtype="<u8", mode="r")
+
+        path = RoaringWriter(tmp_path).write("mapped", mapped)
+
+        assert list(BitMap.deserialize(path.read_bytes())) == ids.tolist()
+
     def test_write_empty(self, tmp_path):
         """Test writing an empty array."""
         writer = RoaringWriter(tmp_path)
@@ -80,13 +101,14 @@ class TestRoaringWriter:
         assert len(data) > 0
 
     def test_write_large_ids(self, tmp_path):
-        """Test writing IDs that exceed 32 bits uses ROAR64 format."""
+        """Test writing IDs that exceed 32 bits uses the BitMap64 format."""
         writer = RoaringWriter(tmp_path)
         ids = np.array([2**40 + 1, 2**40 + 2, 2**50], dtype=np.uint64)
         path = writer.write("large", ids)
 
         data = path.read_bytes()
-        assert data.startswith(b"ROAR64")
+        assert not data.startswith(b"ROAR64")
+        assert list(FrozenBitMap64.deserialize(data)) == ids.tolist()
 
     def test_write_mixed_ids(self, tmp_path):
         """Test writing mix of small and large IDs."""
@@ -96,5 +118,101 @@ class TestRoaringWriter:
         path = writer.write("mixed", ids)
 
         data = path.read_bytes()
-        # Should use ROAR64 because of large IDs
-        assert data.startswith(b"ROAR64")
+        # Should use BitMap64 because of large IDs
+        assert list(FrozenBitMap64.deserialize(data)) == ids.tolist()
+
+    def test_runs_are_run_optimized(self, tmp_path):
+        """Test that consecutive IDs are stored as compact run containers."""
+        writer = RoaringWriter(tmp_path)
+        small = writer.write("small", np.arange(1000, dtype=np.uint64))
+        large = writer.write("large", np.arange(2**40, 2**40 + 1000, dtype=np.uint64))
+
+        assert small.stat().st_size < 64
+        assert large.stat().st_size < 64
+
+    def test_dense_runs_match_bulk_build(self, tmp_path):
+        """Test that sets of long runs serialize like a bulk-built bitmap."""
+        writer = RoaringWriter(tmp_path)
+        starts = np.arange(0, 10**6, 1000, dtype=np.uint64)
+        small = (starts[:, None] + np.arange(100, dtype=np.uint64)).ravel()
+        top = np.arange(2**64 - 200, 2**64 - 1, dtype=np.uint64)
+        top = np.append(top, np.uint64(2**64 - 1))
+
+        expected = BitMap(small.tolist())
+        expected.run_optimize()
+        assert writer.write("small", small).read_bytes() == expected.serialize()
+        data = writer.write("top", top).read_bytes()
+        assert list(FrozenBitMap64.deserialize(data)) == top.tolist()
+
+
+class TestRoaringBuilder:
+    """Tests for RoaringBuilder."""
+
+    def test_unsorted_duplicates_in_batches(self):
+        """Test that unsorted, repeated IDs across batches are deduplicated."""
+        builder = RoaringBuilder(batch_size=3)
+        for node_id in [50, 10, 50, 30, 10, 20, 40]:
+            builder.add(node_id)
+        builder.add_many(np.array([20, 60], dtype=np.uint64))
+
+        assert builder.total_count == 9
+        assert list(builder.to_bitmap()) == [10, 20, 30, 40, 50, 60]
+        assert len(builder) == 6
+
+    def test_len_leaves_batch_pending(self):
+        """Test that taking the length counts pending IDs without flushing them."""
+        builder = RoaringBuilder(batch_size=10)
+        builder.add_many([5, 1, 5])
+        builder.flush()
+        builder.add_many([1, 2**40, 2**40, 3])
+        assert len(builder) == 4
+        assert len(builder.batch) == 4
+
+        builder.add_many([2**41])
+        builder.flush()
+        builder.add_many([2**41, 7, 7])
+        assert len(builder) == 6
+        assert len(builder.batch) == 3
+
+        assert len(builder.to_bitmap()) == 6
+        assert len(builder.batch) == 0
+
+    def test_switches_to_64bit(self, tmp_path):
+        """Test that a large ID converts the bitmap, keeping earlier IDs."""
+        builder = RoaringBuilder(batch_size=2)
+        builder.add_many([7, 3])
+        builder.add_many([2**40, 3])
+
+        bitmap = builder.to_bitmap()
+        assert list(bitmap) == [3, 7, 2**40]
+
+        ids = np.array([3, 7, 2**40], dtype=np.uint64)
+        built = RoaringWriter(tmp_path / "a").write_bitmap("f", bitmap).read_bytes()
+        assert built == RoaringWriter(tmp_path / "b").write("f", ids).read_bytes()
+
+
+class TestPackedU64Writer:
+    """Tests for PackedU64Writer."""
+
+    def test_write_basic(self, tmp_path):
+        """Test that a dense run packs to the header and block tables only."""
+        writer = PackedU64Writer(tmp_path)
+        path = writer.write("dense", np.arange(1000, 1256, dtype=np.uint64))
+
+        assert path.suffix == ".pu64"
+        data = path.read_bytes()
+        assert data.startswith(b"PKDU64")
+        assert len(data) < 256 * 8 // 10
+
+    def test_roundtrip_widths(self, tmp_path):
+        """Test round trips across gap widths, including full 64-bit gaps."""
+        rng = np.random.default_rng(0)
+        writer = PackedU64Writer(tmp_path)
+        for name, ids in {
+            "empty": np.array([], dtype=np.uint64),
+            "single": np.array([7], dtype=np.uint64),
+            "sparse": np.unique(rng.integers(0, 2**40, 1000, dtype=np.uint64)),
+            "extremes": np.array([0, 1, 2**63, 2**64 - 1], dtype=np.uint64),
+        }.items():
+            path = writer.write(name, ids)
+            np.testing.assert_array_equal(PackedIds.load(path).to_array(), ids)